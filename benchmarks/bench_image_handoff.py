@@ -0,0 +1,135 @@
+"""
+Micro-benchmark of the MuPDF -> Qt image hand-off.
+
+Compares the original paths with the ImageBuffer ones:
+
+- thumbnail, original: get_thumbnail copied the samples to bytes; the card
+  wrapped them in a QImage, made a QPixmap of it and smooth-scaled that to
+  the card (_update_thumbnail_data)
+- thumbnail, now: QImage over the pixmap memory, rendered at the card size
+- viewer page, original: get_page_image returned PPM bytes, parsed by
+  QImage.fromData
+- viewer page, now: QImage over the pixmap memory
+
+Only the hand-off is timed; pixmaps are rendered beforehand. Copies are
+measured, not assumed: Python-side bytes with tracemalloc, and Qt-side by
+checking whether the QImage still points into the buffer it was given (or
+the pixmap). QPixmap.fromImage converts for display in both thumbnail paths.
+
+    python benchmarks/bench_image_handoff.py [file.pdf]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import fitz  # PyMuPDF
+import numpy
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QGuiApplication, QImage, QPixmap
+from unimed_pdf_editor.core.image_buffer import ImageBuffer
+from unimed_pdf_editor.ui.thumbnail_renderer import image_from_buffer
+
+CARD_IMAGE_SIZE = (200, 240)
+ROUNDS = 200
+
+def sample_document():
+    doc = fitz.open()
+    page = doc.new_page()
+    for i in range(40):
+        page.insert_text((50, 60 + i * 18), f"Linha {i} - texto de exemplo para o benchmark", fontsize=11)
+    page.draw_rect(fitz.Rect(300, 500, 550, 780), color=(0, 0.6, 0.25), fill=(0.8, 0.95, 0.85))
+    return doc
+
+# Original thumbnail path: the end of PDFManager.get_thumbnail...
+def old_get_thumbnail(pix):
+    return {
+        "width": pix.width,
+        "height": pix.height,
+        "stride": pix.stride,
+        "samples": bytes(pix.samples),
+        "format": "RGB888"
+    }
+
+# ...and CenterCanvas._update_thumbnail_data
+def old_thumbnail_image(image_data):
+    return QImage(
+        image_data['samples'],
+        image_data['width'],
+        image_data['height'],
+        image_data['stride'],
+        QImage.Format.Format_RGB888
+    )
+
+def old_thumbnail_card(image):
+    return QPixmap.fromImage(image).scaled(
+        *CARD_IMAGE_SIZE,
+        Qt.AspectRatioMode.KeepAspectRatio,
+        Qt.TransformationMode.SmoothTransformation
+    )
+
+def new_thumbnail_card(image):
+    return QPixmap.fromImage(image)
+
+# Original viewer path: PDFManager.get_page_image, then RightViewer.load_page
+def old_page_data(pix):
+    return pix.tobytes("ppm")
+
+def address_range(buffer):
+    if isinstance(buffer, dict):
+        buffer = buffer['samples']
+    elif isinstance(buffer, ImageBuffer):
+        buffer = buffer.samples
+    array = numpy.frombuffer(buffer, numpy.uint8)
+    return array.ctypes.data, array.ctypes.data + array.nbytes
+
+def measure_copies(to_buffer, to_image, pix):
+    """(bytes allocated by Python, bytes of pixels Qt copied) for one hand-off."""
+    tracemalloc.start()
+    buffer = to_buffer(pix)
+    image = to_image(buffer)
+    _, python_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    bits = int(image.constBits())
+    shared = any(start <= bits < end for start, end in (address_range(buffer), address_range(pix.samples_mv)))
+    return python_bytes, 0 if shared else image.sizeInBytes()
+
+def timed(func, arg):
+    func(arg) # Warm up
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(arg)
+    return (time.perf_counter() - start) / ROUNDS
+
+def report(label, pix, to_buffer, to_image, to_display=None):
+    elapsed = timed(to_buffer, pix)
+    buffer = to_buffer(pix)
+    elapsed += timed(to_image, buffer)
+    if to_display is not None:
+        elapsed += timed(to_display, to_image(buffer))
+    python_bytes, qt_bytes = measure_copies(to_buffer, to_image, pix)
+    print(f"  {label:<46} {elapsed * 1000:8.3f} ms   python {python_bytes / 1024:8.0f} KiB   qt copy {qt_bytes / 1024:8.0f} KiB")
+
+def main():
+    app = QGuiApplication(sys.argv[:1])
+    doc = fitz.open(sys.argv[1]) if len(sys.argv) > 1 else sample_document()
+    page = doc.load_page(0)
+    print(f"Qt platform: {app.platformName()}, {ROUNDS} rounds")
+
+    fit = min(CARD_IMAGE_SIZE[0] / page.rect.width, CARD_IMAGE_SIZE[1] / page.rect.height)
+    old_pix = page.get_pixmap(matrix=fitz.Matrix(0.3, 0.3), alpha=False)
+    new_pix = page.get_pixmap(matrix=fitz.Matrix(fit, fit), alpha=False)
+    print(f"Thumbnail ({old_pix.width}x{old_pix.height} rescaled vs {new_pix.width}x{new_pix.height} rendered to fit)")
+    report("original: bytes, QImage, QPixmap + scaled", old_pix, old_get_thumbnail, old_thumbnail_image, old_thumbnail_card)
+    report("now: ImageBuffer, QImage, QPixmap", new_pix, ImageBuffer.from_pixmap, image_from_buffer, new_thumbnail_card)
+
+    pix = page.get_pixmap(matrix=fitz.Matrix(2, 2), alpha=False)
+    print(f"Viewer page ({pix.width}x{pix.height})")
+    report("original: tobytes('ppm'), QImage.fromData", pix, old_page_data, QImage.fromData)
+    report("now: ImageBuffer, QImage", pix, ImageBuffer.from_pixmap, image_from_buffer)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+import io
+import os
+import math
+import zlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image, features
+
+# Share of sampled pixels allowed to be colored before an image counts as color
+COLOR_TOLERANCE = 0.005
+# Channel spread (0-255) below which a pixel counts as gray
+COLOR_SPREAD = 24
+# Share of mid-tone pixels (anti-aliased edges, scanner noise) a bilevel image may have
+MIDTONE_TOLERANCE = 0.08
+# Side of the blocks checked one by one, and the mid-tone share that marks one as a photo
+BLOCK_SIZE = 64
+BLOCK_MIDTONE_SHARE = 0.5
+
+def _classify(img):
+    """
+    "1" for black-and-white content, "L" for grayscale, "RGB" for color.
+    Looks at every 4th pixel of each 4th row in one vectorized pass. Mid-tones
+    are also counted per block, so a gray photo taking a small part of a
+    text page (an ID card copy) keeps the page grayscale.
+    """
+    # Nearest-neighbour picks pixels without blending edges into mid-tones
+    sample = img.resize((max(1, img.width // 4), max(1, img.height // 4)), Image.Resampling.NEAREST)
+    pixels = np.asarray(sample)
+    if pixels.ndim == 3:
+        # Element-wise over the channel planes; reducing along the short last axis is much slower
+        red, green, blue = (pixels[..., i].astype(np.int16) for i in range(3))
+        spread = np.maximum(np.maximum(red, green), blue) - np.minimum(np.minimum(red, green), blue)
+        if np.count_nonzero(spread > COLOR_SPREAD) > COLOR_TOLERANCE * spread.size:
+            return "RGB"
+        pixels = (red + green + blue) // 3
+    midtones = (pixels > 64) & (pixels < 192)
+    if np.count_nonzero(midtones) > MIDTONE_TOLERANCE * pixels.size:
+        return "L"
+    block = BLOCK_SIZE // 4 # In sampled pixels
+    rows, cols = midtones.shape[0] // block, midtones.shape[1] // block
+    if rows and cols:
+        shares = midtones[:rows * block, :cols * block].reshape(rows, block, cols, block).mean(axis=(1, 3))
+        if shares.max() > BLOCK_MIDTONE_SHARE:
+            return "L"
+    return "1"
+
+def _otsu_threshold(img):
+    """Gray level that best separates ink from paper (Otsu's method)."""
+    hist = np.array(img.histogram(), dtype=np.float64)
+    levels = np.arange(256)
+    weight_dark = np.cumsum(hist)
+    weight_light = weight_dark[-1] - weight_dark
+    sum_dark = np.cumsum(hist * levels)
+    mean_dark = sum_dark / np.maximum(weight_dark, 1)
+    mean_light = (sum_dark[-1] - sum_dark) / np.maximum(weight_light, 1)
+    between = weight_dark * weight_light * (mean_dark - mean_light) ** 2
+    return int(np.argmax(between)) + 1
+
+def _encode_bilevel(img):
+    """1-bit CCITT G4 stream (or Flate without libtiff), with its filter and DecodeParms."""
+    threshold = _otsu_threshold(img)
+    bilevel = img.point(lambda value: 255 if value >= threshold else 0, mode="1")
+    width, height = img.size
+    if features.check("libtiff"):
+        out = io.BytesIO()
+        # One strip, so the TIFF's data is a single G4 stream PDF can take as is
+        bilevel.save(out, "TIFF", compression="group4", tiffinfo={278: height})
+        tiff = Image.open(out)
+        offset, length = tiff.tag_v2[273][0], tiff.tag_v2[279][0]
+        stream = out.getvalue()[offset:offset + length]
+        return stream, "/CCITTFaxDecode", f"<</K -1/Columns {width}/Rows {height}/BlackIs1 true>>"
+    # Mode "1" rows are packed MSB first with 1 for white, as DeviceGray 1-bit expects
+    stream = zlib.compress(bilevel.tobytes(), 9)
+    return stream, "/FlateDecode", "null"
+
+def _encode_image(source, target, bilevel_target, jpeg_quality):
+    """
+    Runs on the worker pool: decodes one image, detects whether it is color,
+    grayscale or black-and-white, resamples it to `target` (or
+    `bilevel_target` for black-and-white) and encodes it as RGB or gray JPEG,
+    or 1-bit G4. Pillow and NumPy release the GIL while working, so several
+    images are processed at once.
+    Returns (stream, width, height, mode, filter, DecodeParms).
+    """
+    if source[0] == "jpeg":
+        img = Image.open(io.BytesIO(source[1]))
+        mode = "L" if img.mode in ("L", "1") else "RGB"
+        if bilevel_target[0] < img.width or bilevel_target[1] < img.height:
+            # Let the JPEG decoder scale down by 1/2, 1/4 or 1/8 while decoding
+            img.draft(mode, bilevel_target)
+    else:
+        _, mode, width, height, samples = source
+        img = Image.frombytes(mode, (width, height), samples)
+
+    if img.mode != mode:
+        img = img.convert(mode)
+    mode = _classify(img)
+    if mode == "1":
+        target = bilevel_target
+    if img.mode != mode:
+        img = img.convert("L" if mode == "1" else mode)
+    if img.size != target:
+        img = img.resize(target, Image.Resampling.BICUBIC)
+
+    if mode == "1":
+        stream, filter_name, decode_parms = _encode_bilevel(img)
+        return stream, img.width, img.height, mode, filter_name, decode_parms
+
+    out = io.BytesIO()
+    # Optimized Huffman tables, as MuPDF's own JPEG writer does
+    img.save(out, "JPEG", quality=jpeg_quality, optimize=True)
+    return out.getvalue(), img.width, img.height, mode, "/DCTDecode", "null"
+
+class ImageRecompressor:
+    """
+    Re-encodes the images of a document, resampled to `target_dpi` at the
+    largest size each one is drawn on a page: color ones as RGB JPEG, gray
+    ones as gray JPEG and black-and-white ones (scanned forms) as 1-bit G4 at
+    `BILEVEL_FACTOR` times the resolution, since thresholded text needs more
+    pixels but costs far fewer bytes.
+    Images not placed on any page fall back to the `MAX_DIM` pixel limit;
+    `max_dim`, when given, caps every image. Decoding and encoding run on a thread pool; only the reads
+    from and writes to the document happen on the calling thread, since MuPDF
+    documents are not thread-safe.
+    """
+    TARGET_DPI = 150
+    BILEVEL_FACTOR = 2
+    MAX_DIM = 1500
+    JPEG_QUALITY = 50
+
+    def __init__(self, max_workers=None, target_dpi=TARGET_DPI, max_dim=None, jpeg_quality=JPEG_QUALITY):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        # Decoded images held at once, caps memory on scanned bundles
+        self.max_in_flight = self.max_workers * 2
+        self.target_dpi = target_dpi
+        self.max_dim = max_dim
+        self.jpeg_quality = jpeg_quality
+
+    def collect_images(self, doc):
+        """Image xrefs used by the document's pages, each listed once."""
+        xrefs = []
+        seen = set()
+        for page in doc:
+            for img in page.get_images():
+                xref = img[0]
+                if xref <= 0 or xref in seen:
+                    continue
+                seen.add(xref)
+                # Stencil masks are not pictures; re-encoding them would break them
+                if doc.xref_get_key(xref, "ImageMask")[1] == "true":
+                    continue
+                xrefs.append(xref)
+        return xrefs
+
+    def display_sizes(self, doc, xrefs):
+        """xref -> (width, height) in inches of the largest placement of each image."""
+        wanted = set(xrefs)
+        sizes = {}
+
+        def add(xref, width, height, image_size):
+            if image_size is not None and (width > height) != (image_size[0] > image_size[1]):
+                # Axis-aligned box of an image drawn turned by 90 degrees
+                width, height = height, width
+            old = sizes.get(xref, (0, 0))
+            sizes[xref] = (max(old[0], width / 72), max(old[1], height / 72))
+
+        for page in doc:
+            page_xrefs = {img[0] for img in page.get_images()} & wanted
+            if not page_xrefs:
+                continue
+            try:
+                if len(page_xrefs) == 1:
+                    # Only one picture (the usual scanned page): the bbox log does not
+                    # decode images, unlike get_image_info/get_image_rects. Boxes of
+                    # skewed placements are larger than the image, which only keeps more pixels.
+                    xref = next(iter(page_xrefs))
+                    image_size = self._image_size(doc, xref)
+                    for kind, bbox in page.get_bboxlog():
+                        if kind == "fill-image":
+                            add(xref, bbox[2] - bbox[0], bbox[3] - bbox[1], image_size)
+                else:
+                    for info in page.get_image_info(xrefs=True):
+                        if info["xref"] in page_xrefs:
+                            # The matrix maps the unit square onto the drawn image, rotation included
+                            a, b, c, d, _, _ = info["transform"]
+                            add(info["xref"], math.hypot(a, b), math.hypot(c, d), None)
+            except Exception as e:
+                print(f"Failed to locate images on page {page.number}: {e}")
+        return sizes
+
+    def output_size(self, width, height, display_size=None, dpi=None):
+        """Pixel size a `width` x `height` image is resampled to. Never upscales."""
+        dpi = dpi or self.target_dpi
+        if display_size and display_size[0] > 0 and display_size[1] > 0:
+            # The more demanding axis decides, so stretched images keep the dpi both ways
+            scale = max(display_size[0] * dpi / width, display_size[1] * dpi / height)
+        else:
+            scale = self.MAX_DIM / max(width, height)
+        if self.max_dim is not None:
+            scale = min(scale, self.max_dim / max(width, height))
+        # A resample that would only shave off a pixel or two is not worth it
+        if scale >= 0.99:
+            return width, height
+        return max(1, int(width * scale)), max(1, int(height * scale))
+
+    def output_sizes(self, width, height, display_size=None):
+        """(target, bilevel target) pixel sizes, see _encode_image."""
+        bilevel_dpi = self.target_dpi * self.BILEVEL_FACTOR
+        return self.output_size(width, height, display_size), self.output_size(width, height, display_size, bilevel_dpi)
+
+    def _image_size(self, doc, xref):
+        return int(doc.xref_get_key(xref, "Width")[1] or 0), int(doc.xref_get_key(xref, "Height")[1] or 0)
+
+    def _read_source(self, doc, xref):
+        """What a worker needs to re-encode `xref`, read on the calling thread."""
+        if doc.xref_get_key(xref, "Filter")[1] == "/DCTDecode" and doc.xref_get_key(xref, "Decode")[0] == "null":
+            # Gray or RGB JPEG: hand the stream over as is and decode it on the pool
+            info = doc.extract_image(xref)
+            if info.get("ext") == "jpeg" and info.get("colorspace") in (1, 3):
+                return ("jpeg", info["image"])
+
+        pix = fitz.Pixmap(doc, xref)
+        if pix.n - pix.alpha > 3:
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        if pix.n not in (1, 3):
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        return ("raw", "L" if pix.n == 1 else "RGB", pix.width, pix.height, pix.samples)
+
+    def _write_image(self, doc, xref, stream, width, height, mode, filter_name, decode_parms):
+        doc.update_stream(xref, stream, compress=False)
+        doc.xref_set_key(xref, "Width", str(width))
+        doc.xref_set_key(xref, "Height", str(height))
+        doc.xref_set_key(xref, "Filter", filter_name)
+        doc.xref_set_key(xref, "DecodeParms", decode_parms)
+        doc.xref_set_key(xref, "Decode", "null")
+        doc.xref_set_key(xref, "BitsPerComponent", "1" if mode == "1" else "8")
+        doc.xref_set_key(xref, "ColorSpace", "/DeviceRGB" if mode == "RGB" else "/DeviceGray")
+
+    def recompress(self, doc, progress_callback=None, cancel_token=None):
+        """
+        Re-encodes every image of `doc` in place. progress_callback(done, total)
+        is called per image. Returns the number of images replaced.
+        """
+        xrefs = self.collect_images(doc)
+        display_sizes = self.display_sizes(doc, xrefs)
+        total = len(xrefs)
+        pending = iter(xrefs)
+        done = 0
+        replaced = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            in_flight = {}
+            try:
+                while done < total:
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+
+                    while len(in_flight) < self.max_in_flight:
+                        xref = next(pending, None)
+                        if xref is None:
+                            break
+                        try:
+                            source = self._read_source(doc, xref)
+                            targets = self.output_sizes(*self._image_size(doc, xref), display_sizes.get(xref))
+                        except Exception as e:
+                            print(f"Failed to compress image xref {xref}: {e}")
+                            done += 1
+                            if progress_callback:
+                                progress_callback(done, total)
+                            continue
+                        in_flight[pool.submit(_encode_image, source, *targets, self.jpeg_quality)] = xref
+
+                    if not in_flight:
+                        continue
+
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        xref = in_flight.pop(future)
+                        try:
+                            self._write_image(doc, xref, *future.result())
+                            replaced += 1
+                        except Exception as e:
+                            print(f"Failed to compress image xref {xref}: {e}")
+                        done += 1
+                        if progress_callback:
+                            progress_callback(done, total)
+            finally:
+                for future in in_flight:
+                    future.cancel()
+
+        return replaced
+
+# Recompression settings as (target_dpi, jpeg_quality), from mildest to most aggressive
+QUALITY_LADDER = [
+    (300, 75), (200, 70), (200, 60), (150, 60), (150, 50), (120, 50),
+    (120, 40), (100, 40), (100, 30), (85, 30), (85, 25), (72, 25), (72, 20),
+]
+
+class TargetSizeSearch:
+    """
+    Finds the mildest QUALITY_LADDER step expected to fit a document's images
+    into a byte budget. Sizes are estimated from a few sample images encoded
+    at each step (bytes per output pixel), so the document is not re-saved
+    for every candidate.
+    """
+    SAMPLE_IMAGES = 8
+
+    def __init__(self, doc, ladder=QUALITY_LADDER, sample_images=SAMPLE_IMAGES, max_workers=None):
+        self.ladder = ladder
+        self.max_workers = max_workers
+        reader = ImageRecompressor(max_workers=max_workers)
+        xrefs = reader.collect_images(doc)
+        display_sizes = reader.display_sizes(doc, xrefs)
+        self.images = [] # (xref, width, height, display size in inches)
+        self.original_bytes = 0
+        for xref in xrefs:
+            width, height = reader._image_size(doc, xref)
+            if width and height:
+                self.images.append((xref, width, height, display_sizes.get(xref)))
+                self.original_bytes += len(doc.xref_stream_raw(xref))
+
+        # Evenly spread over the images sorted by pixel count
+        by_size = sorted(self.images, key=lambda image: image[1] * image[2])
+        count = min(sample_images, len(by_size))
+        picks = [by_size[i * len(by_size) // count] for i in range(count)] if count else []
+        self.samples = []
+        for xref, width, height, display_size in picks:
+            try:
+                self.samples.append((reader._read_source(doc, xref), width, height, display_size))
+            except Exception as e:
+                print(f"Failed to sample image xref {xref}: {e}")
+        self._estimates = {}
+
+    def recompressor(self, step):
+        """ImageRecompressor configured for ladder `step`."""
+        target_dpi, quality = self.ladder[step]
+        return ImageRecompressor(max_workers=self.max_workers, target_dpi=target_dpi, jpeg_quality=quality)
+
+    def estimate(self, step):
+        """Estimated total bytes of all images after recompressing at `step`."""
+        if step in self._estimates:
+            return self._estimates[step]
+        if not self.samples:
+            return 0
+        recompressor = self.recompressor(step)
+
+        def encode(sample):
+            source, width, height, display_size = sample
+            targets = recompressor.output_sizes(width, height, display_size)
+            return len(_encode_image(source, *targets, recompressor.jpeg_quality)[0]), targets[0]
+
+        with ThreadPoolExecutor(max_workers=recompressor.max_workers) as pool:
+            encoded = list(pool.map(encode, self.samples))
+        # Per pixel of the color/gray target, so black-and-white images at their
+        # higher resolution still extrapolate correctly
+        sample_bytes = sum(size for size, _ in encoded)
+        sample_pixels = sum(width * height for _, (width, height) in encoded)
+        bytes_per_pixel = sample_bytes / max(1, sample_pixels)
+
+        total_pixels = 0
+        for _, width, height, display_size in self.images:
+            out_width, out_height = recompressor.output_size(width, height, display_size)
+            total_pixels += out_width * out_height
+        self._estimates[step] = int(total_pixels * bytes_per_pixel)
+        return self._estimates[step]
+
+    def choose(self, image_budget):
+        """Index of the mildest step whose estimate fits `image_budget` (or the last one)."""
+        low, high = 0, len(self.ladder) - 1
+        while low < high:
+            mid = (low + high) // 2
+            if self.estimate(mid) <= image_budget:
+                high = mid
+            else:
+                low = mid + 1
+        return low
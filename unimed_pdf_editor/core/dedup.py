@@ -0,0 +1,140 @@
+import re
+import hashlib
+
+_REF = re.compile(rb"(\d+) 0 R\b")
+
+def _refs(text):
+    return [int(ref) for ref in _REF.findall(text.encode())]
+
+def _remap(text, canonical):
+    return _REF.sub(lambda m: b"%d 0 R" % canonical.get(int(m.group(1)), int(m.group(1))), text.encode()).decode()
+
+def _dedup_roots(doc):
+    """Image streams and font dictionaries: where shared objects come from when merging."""
+    roots = []
+    for xref in range(1, doc.xref_length()):
+        if doc.xref_get_key(xref, "Subtype")[1] == "/Image" or doc.xref_get_key(xref, "Type")[1] == "/Font":
+            roots.append(xref)
+    return roots
+
+def _font_file(doc, xref):
+    """Xref of the embedded font program of font `xref` (or its descendant font), or None."""
+    kind, value = doc.xref_get_key(xref, "DescendantFonts")
+    if kind in ("array", "xref"):
+        refs = _refs(value)
+        if refs and doc.xref_get_key(refs[0], "Type")[1] != "/Font":
+            refs = _refs(doc.xref_object(refs[0])) # Indirect array
+        if refs:
+            xref = refs[0]
+    kind, value = doc.xref_get_key(xref, "FontDescriptor")
+    if kind != "xref":
+        return None
+    descriptor = _refs(value)[0]
+    for key in ("FontFile", "FontFile2", "FontFile3"):
+        kind, value = doc.xref_get_key(descriptor, key)
+        if kind == "xref":
+            return _refs(value)[0]
+    return None
+
+def deduplicate_objects(doc, cancel_token=None):
+    """
+    Makes every reference to a duplicated image or font point at one copy.
+    Candidates are the image streams and font dictionaries plus everything
+    they reference (color profiles, soft masks, font programs, widths...).
+    Each is keyed by a hash of its dictionary, with references already
+    remapped, and its raw stream, so identical objects from different source
+    files collapse in a few linear passes; MuPDF's own duplicate search
+    (garbage=3/4) compares objects pairwise. The copies left unreferenced
+    are dropped when the document is saved with garbage collection.
+    Returns the number of objects merged.
+    """
+    # Collect the candidates and the objects they reference
+    texts = {}
+    pending = _dedup_roots(doc)
+    while pending:
+        xref = pending.pop()
+        if xref in texts or not 0 < xref < doc.xref_length():
+            continue
+        if doc.xref_get_key(xref, "Type")[1] in ("/Page", "/Pages", "/Catalog", "/Annot"):
+            continue
+        texts[xref] = doc.xref_object(xref, compressed=True)
+        pending.extend(_refs(texts[xref]))
+
+    stream_digests = {}
+    for xref in texts:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        if doc.xref_is_stream(xref):
+            stream_digests[xref] = hashlib.blake2b(doc.xref_stream_raw(xref), digest_size=20).digest()
+
+    # Merging children makes their parents identical; repeat until nothing changes
+    canonical = {}
+    while True:
+        first_by_key = {}
+        merged = False
+        for xref in sorted(texts):
+            if xref in canonical:
+                continue
+            key = (_remap(texts[xref], canonical), stream_digests.get(xref))
+            first = first_by_key.setdefault(key, xref)
+            if first != xref:
+                canonical[xref] = first
+                merged = True
+        if not merged:
+            break
+    if not canonical:
+        return 0
+
+    # Point every remaining reference at the kept copy
+    for xref in range(1, doc.xref_length()):
+        if cancel_token is not None and xref % 1000 == 0:
+            cancel_token.raise_if_cancelled()
+        if xref in canonical:
+            continue
+        text = doc.xref_object(xref, compressed=True)
+        if not any(ref in canonical for ref in _refs(text)):
+            continue
+        if doc.xref_is_stream(xref):
+            # update_object would drop the stream data, rewrite the keys instead
+            for key in doc.xref_get_keys(xref):
+                kind, value = doc.xref_get_key(xref, key)
+                if kind in ("xref", "array", "dict") and any(ref in canonical for ref in _refs(value)):
+                    doc.xref_set_key(xref, key, _remap(value, canonical))
+        else:
+            doc.update_object(xref, _remap(text, canonical))
+    return len(canonical)
+
+def page_content_hash(doc, page_number, stream_digests=None):
+    """
+    Hex digest of what a page shows: its size, content stream and the bytes of
+    the images, forms and fonts it uses, so the same page taken from two files
+    hashes alike. `stream_digests` memoizes per-xref digests across pages.
+    """
+    if stream_digests is None:
+        stream_digests = {}
+
+    def stream_digest(xref):
+        digest = stream_digests.get(xref)
+        if digest is None:
+            digest = stream_digests[xref] = hashlib.blake2b(doc.xref_stream_raw(xref) or b"", digest_size=20).digest()
+        return digest
+
+    page = doc.load_page(page_number)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr((tuple(page.mediabox), tuple(page.cropbox), page.rotation)).encode())
+    h.update(page.read_contents())
+    for xref, _, _, _, _, _, _, name, _, _ in sorted(page.get_images(full=True), key=lambda img: img[7]):
+        h.update(name.encode())
+        h.update(stream_digest(xref))
+    for xref, name, _, _ in sorted(page.get_xobjects(), key=lambda xobj: xobj[1]):
+        h.update(name.encode())
+        h.update(stream_digest(xref))
+    for xref, _, font_type, basefont, name, encoding, _ in sorted(page.get_fonts(full=True), key=lambda font: font[4]):
+        h.update(repr((name, font_type, basefont, encoding)).encode())
+        # Two subsets of the same font share a name but not their glyphs
+        font_file = _font_file(doc, xref) if xref else None
+        if font_file is not None:
+            h.update(stream_digest(font_file))
+    for annot in page.annots():
+        h.update(repr((annot.type[1], tuple(annot.rect), annot.info.get("content"))).encode())
+    return h.hexdigest()
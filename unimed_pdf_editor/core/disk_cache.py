@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import time
+import shutil
+import zlib
+import struct
+import threading
+import uuid
+from .image_buffer import ImageBuffer
+
+APP_DIR_NAME = "UnimedPDF"
+
+def user_cache_dir():
+    """Per-user cache directory (LOCALAPPDATA on Windows, XDG cache elsewhere)."""
+    if os.name == 'nt':
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, APP_DIR_NAME, "Cache")
+    if sys.platform == "darwin":
+        return os.path.join(os.path.expanduser("~/Library/Caches"), APP_DIR_NAME)
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, APP_DIR_NAME)
+
+class DiskCache:
+    """
+    Size-limited key -> bytes store on disk. Recency is tracked through file
+    modification times; when the budget is exceeded the oldest entries are
+    removed until the cache is back under `EVICT_TO` of its limit.
+    Safe to use from several threads.
+    """
+    EVICT_TO = 0.9
+    SUFFIX = ".bin"
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._total_bytes = None # Scanned lazily on first write
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + self.SUFFIX)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path) # Mark as recently used
+            return data
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Failed to write cache entry {key}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._total_bytes += len(data)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(self.SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._scan())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.EVICT_TO
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._scan():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._total_bytes = 0
+
+class DiskThumbnailCache(DiskCache):
+    """
+    Persists rendered thumbnails across sessions. Keys are built from the
+    source file's content hash, so a renamed or re-downloaded copy of the same
+    PDF still hits the cache. Samples are stored zlib-compressed.
+    """
+    MAX_BYTES = 512 * 1024 * 1024
+    SUFFIX = ".thumb"
+    _HEADER = struct.Struct("<4sIII")
+    _MAGIC = b"UTH1"
+
+    def __init__(self, directory=None, max_bytes=MAX_BYTES):
+        super().__init__(directory or os.path.join(user_cache_dir(), "thumbnails"), max_bytes)
+
+    @staticmethod
+    def make_key(content_hash, page_number, rotation, scale):
+        return f"{content_hash}-{page_number}-{rotation}-{round(scale * 1000)}"
+
+    def get_thumbnail(self, key):
+        data = self.get(key)
+        if data is None or len(data) < self._HEADER.size:
+            return None
+        magic, width, height, stride = self._HEADER.unpack_from(data)
+        if magic != self._MAGIC:
+            return None
+        try:
+            samples = zlib.decompress(data[self._HEADER.size:])
+        except zlib.error:
+            return None
+        return ImageBuffer(width, height, stride, samples)
+
+    def put_thumbnail(self, key, img_data):
+        header = self._HEADER.pack(self._MAGIC, img_data.width, img_data.height, img_data.stride)
+        self.put(key, header + zlib.compress(img_data.samples, 1))
+
+class OCRCheckpointStore(DiskCache):
+    """
+    Completed OCR page results, keyed by a hash of the rendered page. An
+    interrupted job that is run again only OCRs the pages it had not finished,
+    and identical pages are recognized once. Also hands out per-job working
+    directories under the same root; leftovers from crashed runs are removed
+    once they are older than `JOB_MAX_AGE`.
+    """
+    MAX_BYTES = 256 * 1024 * 1024
+    SUFFIX = ".ocr"
+    JOB_MAX_AGE = 24 * 3600
+
+    def __init__(self, root=None, max_bytes=MAX_BYTES):
+        self.root = root or os.path.join(user_cache_dir(), "ocr")
+        self.jobs_dir = os.path.join(self.root, "jobs")
+        super().__init__(os.path.join(self.root, "pages"), max_bytes)
+
+    @staticmethod
+    def make_key(page_hash, mode, dpi):
+        return f"{page_hash}-{mode}-{dpi}"
+
+    def get_result(self, key):
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def put_result(self, key, result):
+        self.put(key, json.dumps(result).encode("utf-8"))
+
+    def get_pdf(self, key):
+        return self.get(key + "-pdf")
+
+    def put_pdf(self, key, data):
+        self.put(key + "-pdf", data)
+
+    def create_job_dir(self):
+        self._remove_stale_jobs()
+        path = os.path.join(self.jobs_dir, uuid.uuid4().hex)
+        os.makedirs(path)
+        return path
+
+    def remove_job_dir(self, path):
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _remove_stale_jobs(self):
+        try:
+            names = os.listdir(self.jobs_dir)
+        except OSError:
+            return
+        cutoff = time.time() - self.JOB_MAX_AGE
+        for name in names:
+            path = os.path.join(self.jobs_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                pass
@@ -0,0 +1,33 @@
+import os
+import hashlib
+import threading
+
+_CHUNK_SIZE = 1024 * 1024
+
+# (abspath, size, mtime_ns) -> hex digest, so re-adding a file doesn't re-read it
+_file_hash_memo = {}
+_memo_lock = threading.Lock()
+
+def file_content_hash(filepath):
+    """
+    Returns a hex digest of the file contents. Results are memoized per path,
+    size and modification time for the lifetime of the process.
+    """
+    path = os.path.abspath(filepath)
+    st = os.stat(path)
+    memo_key = (path, st.st_size, st.st_mtime_ns)
+
+    with _memo_lock:
+        digest = _file_hash_memo.get(memo_key)
+    if digest is not None:
+        return digest
+
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    with _memo_lock:
+        _file_hash_memo[memo_key] = digest
+    return digest
@@ -0,0 +1,23 @@
+class ImageBuffer:
+    """
+    RGB888 pixels handed from MuPDF to the UI without copies. `samples` is any
+    buffer (a memoryview over a pixmap's own memory, or bytes read back from
+    the disk cache) that Qt can wrap directly; `owner` keeps the memory behind
+    a memoryview alive, since the view itself does not.
+    """
+    __slots__ = ("width", "height", "stride", "samples", "owner")
+
+    def __init__(self, width, height, stride, samples, owner=None):
+        self.width = width
+        self.height = height
+        self.stride = stride
+        self.samples = samples
+        self.owner = owner
+
+    @classmethod
+    def from_pixmap(cls, pix):
+        return cls(pix.width, pix.height, pix.stride, pix.samples_mv, pix)
+
+    @property
+    def nbytes(self):
+        return memoryview(self.samples).nbytes
@@ -0,0 +1,22 @@
+import threading
+
+class JobCancelled(Exception):
+    """Raised by a long-running operation when its CancelToken has been set."""
+
+class CancelToken:
+    """
+    Set from the UI to stop a running operation. Operations poll it between
+    pages, so cancelling takes effect after the page currently in progress.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise JobCancelled()
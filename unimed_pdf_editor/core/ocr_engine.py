@@ -1,16 +1,161 @@
 import sys
 import os
-import pytesseract
-from PIL import Image
+import time
+import hashlib
+import subprocess
+import multiprocessing
 import fitz # PyMuPDF
-from pypdf import PdfWriter, PdfReader
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-import io
+from .disk_cache import OCRCheckpointStore
+from .jobs import JobCancelled
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Per-process state of the OCR pool workers
+_worker_docs = {}
+_worker_state = {}
+
+def _init_worker(tesseract_cmd, checkpoint_root=None):
+    _worker_state["tesseract_cmd"] = tesseract_cmd
+    _worker_state["checkpoints"] = OCRCheckpointStore(checkpoint_root) if checkpoint_root else None
+    # Pages already run in parallel; keep each Tesseract process single-threaded
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+def _run_tesseract(image_data, output_format, dpi):
+    """Feeds an image to Tesseract on stdin and returns what it writes to stdout."""
+    kwargs = {}
+    if os.name == 'nt':
+        # No console window flashing up for every page
+        kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+    result = subprocess.run(
+        [_worker_state["tesseract_cmd"], "stdin", "stdout", "--dpi", str(dpi), output_format],
+        input=image_data, capture_output=True, check=False, **kwargs
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode(errors="replace").strip() or "Tesseract failed")
+    return result.stdout
+
+def _scale_words(words, sx, sy):
+    return [(x0 * sx, y0 * sy, x1 * sx, y1 * sy, text) for x0, y0, x1, y1, text in words]
+
+def _parse_tsv_words(tsv):
+    """Word boxes (x0, y0, x1, y1, text) in pixels from Tesseract TSV output."""
+    lines = tsv.decode("utf-8", errors="replace").splitlines()
+    if not lines:
+        return []
+    columns = {name: i for i, name in enumerate(lines[0].split("\t"))}
+    words = []
+    for line in lines[1:]:
+        fields = line.split("\t")
+        if len(fields) < len(columns) or fields[columns["level"]] != "5": # 5 = word
+            continue
+        text = fields[columns["text"]].strip()
+        if not text:
+            continue
+        x, y = int(fields[columns["left"]]), int(fields[columns["top"]])
+        w, h = int(fields[columns["width"]]), int(fields[columns["height"]])
+        words.append((x, y, x + w, y + h, text))
+    return words
+
+def _ocr_page(input_pdf_path, page_num, mode, dpi):
+    """
+    Runs in a pool process: renders one page and OCRs it. Returns the recognized
+    words as (x0, y0, x1, y1, text) in page coordinates for the overlay mode, or
+    Tesseract's own PDF page for the replace mode, plus the stage timings.
+    Results are looked up in / saved to the checkpoint store when there is one.
+    """
+    doc = _worker_docs.get(input_pdf_path)
+    if doc is None:
+        doc = _worker_docs[input_pdf_path] = fitz.open(input_pdf_path)
+    timings = {}
+
+    # Render straight to 8-bit grayscale, which is what Tesseract works on anyway
+    t = time.perf_counter()
+    page = doc[page_num]
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    timings["render"] = time.perf_counter() - t
+
+    # A PGM header in front of the raw samples, no PNG encode/decode round-trip
+    t = time.perf_counter()
+    samples = pix.samples_mv
+    if pix.stride != pix.width:
+        samples = b"".join(samples[y * pix.stride:y * pix.stride + pix.width] for y in range(pix.height))
+    image_data = b"P5\n%d %d\n255\n" % (pix.width, pix.height) + samples
+    timings["encode"] = time.perf_counter() - t
+
+    checkpoints = _worker_state.get("checkpoints")
+    key = None
+    if checkpoints is not None:
+        # Same pixels -> same OCR output, whatever file or position the page came from
+        page_hash = hashlib.blake2b(image_data, digest_size=20).hexdigest()
+        key = OCRCheckpointStore.make_key(page_hash, mode, dpi)
+        if mode == OCREngine.MODE_REPLACE:
+            result = checkpoints.get_pdf(key)
+        else:
+            result = checkpoints.get_result(key)
+            # Word boxes are stored in pixels, the page size may differ
+            if result is not None:
+                result = _scale_words(result, page.rect.width / pix.width, page.rect.height / pix.height)
+        if result is not None:
+            return result, timings
+
+    # Run OCR
+    t = time.perf_counter()
+    if mode == OCREngine.MODE_REPLACE:
+        result = _run_tesseract(image_data, "pdf", dpi)
+        if key is not None:
+            checkpoints.put_pdf(key, result)
+    else:
+        words = _parse_tsv_words(_run_tesseract(image_data, "tsv", dpi))
+        if key is not None:
+            checkpoints.put_result(key, words)
+        # The pixmap shows the page as displayed (rotation applied)
+        result = _scale_words(words, page.rect.width / pix.width, page.rect.height / pix.height)
+    timings["ocr"] = time.perf_counter() - t
+    return result, timings
+
+def _insert_invisible_words(page, words):
+    """Writes OCR words onto `page` as invisible (render mode 3) text."""
+    shape = page.new_shape()
+    # Word boxes are in displayed coordinates; text is written unrotated and
+    # turned with the page so it reads left to right on screen
+    rm = page.rotation_matrix
+    to_display = fitz.Matrix(rm.a, rm.b, rm.c, rm.d, 0, 0)
+    for x0, y0, x1, y1, text in words:
+        origin = fitz.Point(x0, y1) * page.derotation_matrix
+        fontsize = max(y1 - y0, 1)
+        length = fitz.get_text_length(text, fontname="helv", fontsize=fontsize)
+        # Stretch horizontally so the text covers the word box (search highlights)
+        stretch = fitz.Matrix((x1 - x0) / length if length else 1, 1)
+        shape.insert_text(origin, text, fontname="helv", fontsize=fontsize,
+                          rotate=page.rotation, render_mode=3,
+                          morph=(origin, to_display * stretch * ~to_display))
+    shape.commit()
 
 class OCREngine:
-    def __init__(self):
+    # Pages with at least this much extractable text are not OCRed
+    MIN_TEXT_CHARS = 20
+    # An image covering this share of the page makes it a scan, whatever text is stamped on it
+    SCAN_COVERAGE = 0.5
+    # Invisible text layer over the original page content
+    MODE_OVERLAY = "overlay"
+    # Page replaced by Tesseract's image + text PDF (loses vector content)
+    MODE_REPLACE = "replace"
+
+    # Render resolution for OCR; Tesseract is most accurate around 300 dpi
+    DEFAULT_DPI = 300
+
+    def __init__(self, max_workers=None, max_in_flight=None, mode=MODE_OVERLAY, dpi=DEFAULT_DPI,
+                 checkpoints=None):
         self._setup_tesseract_path()
+        self.mode = mode
+        self.dpi = dpi
+        # OCRCheckpointStore for resumable runs, None to always OCR every page
+        self.checkpoints = checkpoints
+        # Seconds spent per stage in the last make_searchable run (summed over pages)
+        self.timings = {}
+        # Leave one core for the UI
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        # Rendered pages/results held at once, caps memory on long documents
+        self.max_in_flight = max_in_flight or self.max_workers * 2
 
     def _setup_tesseract_path(self):
         """
@@ -30,41 +175,111 @@ class OCREngine:
             # Here we just check if it's reachable, otherwise user might need to install it
             tesseract_path = 'tesseract'
 
-        pytesseract.pytesseract.tesseract_cmd = tesseract_path
+        self.tesseract_cmd = tesseract_path
+
+    def _has_text_layer(self, page):
+        if len(page.get_text("text").strip()) < self.MIN_TEXT_CHARS:
+            return False
+        # The bbox log lists what is drawn without decoding any image
+        log = page.get_bboxlog()
+        page_area = abs(page.rect)
+        scans = [fitz.Rect(bbox) for kind, bbox in log
+                 if kind == "fill-image" and abs(fitz.Rect(bbox) & page.rect) >= self.SCAN_COVERAGE * page_area]
+        if not scans:
+            return True
+        # Invisible text over the scan is the layer of an earlier OCR run
+        if any(kind == "ignore-text" and any(fitz.Rect(bbox).intersects(scan) for scan in scans) for kind, bbox in log):
+            return True
+        # Visible text printed on it (protocol stamps, page numbers added by upload
+        # portals) does not make the scanned content searchable; only text beside it counts
+        def on_scan(word):
+            x0, y0, x1, y1 = word[:4]
+            center = fitz.Point((x0 + x1) / 2, (y0 + y1) / 2)
+            return any(scan.contains(center) for scan in scans)
+        outside = sum(len(word[4]) for word in page.get_text("words") if not on_scan(word))
+        return outside >= self.MIN_TEXT_CHARS
 
-    def make_searchable(self, input_pdf_path, output_pdf_path, progress_callback=None):
+    def find_text_pages(self, doc):
+        """Page numbers that already carry a usable text layer and need no OCR."""
+        return {page_num for page_num, page in enumerate(doc) if self._has_text_layer(page)}
+
+    def _apply_result(self, output_doc, page_num, result):
+        if self.mode == self.MODE_REPLACE:
+            # Swap the page for the OCR'd PDF page
+            with fitz.open("pdf", result) as ocr_doc:
+                output_doc.insert_pdf(ocr_doc, start_at=page_num)
+            output_doc.delete_page(page_num + 1)
+        else:
+            _insert_invisible_words(output_doc[page_num], result)
+
+    def make_searchable(self, input_pdf_path, output_pdf_path, progress_callback=None, cancel_token=None):
         """
         Takes a PDF, runs OCR on each page, and saves a new PDF with text layer.
+        Pages that already have text are kept unchanged; the others are OCRed on
+        a process pool and written back in their original order. In overlay mode
+        the recognized words are added as invisible text on the original pages.
+        Setting `cancel_token` stops the run after the pages already in flight and
+        raises JobCancelled.
         """
         try:
-            doc = fitz.open(input_pdf_path)
-            writer = PdfWriter()
-
-            total_pages = len(doc)
+            output_doc = fitz.open(input_pdf_path)
+            total_pages = len(output_doc)
+            text_pages = self.find_text_pages(output_doc)
 
-            for page_num, page in enumerate(doc):
-                if progress_callback:
-                    progress_callback(page_num, total_pages)
+            ocr_pages = iter([n for n in range(total_pages) if n not in text_pages])
+            pending_ocr = total_pages - len(text_pages) # Not yet submitted
+            results = {} # page_num -> OCR result, waiting for earlier pages
+            written = 0 # Pages already finished in output_doc
+            self.timings = {"render": 0.0, "encode": 0.0, "ocr": 0.0, "assemble": 0.0}
+            started = time.perf_counter()
 
-                # Get image from page
-                pix = page.get_pixmap()
-                img_data = pix.tobytes("png")
-                image = Image.open(io.BytesIO(img_data))
+            # Spawn, not fork: this runs on a job thread while Qt and the render pools are live,
+            # and a forked child can inherit their locks held
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, max(1, pending_ocr)),
+                                     mp_context=multiprocessing.get_context("spawn"),
+                                     initializer=_init_worker,
+                                     initargs=(self.tesseract_cmd,
+                                               self.checkpoints.root if self.checkpoints else None)) as pool:
+                in_flight = {}
+                while written < total_pages:
+                    if cancel_token is not None and cancel_token.is_set():
+                        for future in in_flight:
+                            future.cancel()
+                        output_doc.close()
+                        raise JobCancelled()
 
-                # Run OCR
-                # get PDF data from tesseract
-                pdf_data = pytesseract.image_to_pdf_or_hocr(image, extension='pdf')
+                    while pending_ocr and len(in_flight) + len(results) < self.max_in_flight:
+                        page_num = next(ocr_pages)
+                        in_flight[pool.submit(_ocr_page, input_pdf_path, page_num, self.mode, self.dpi)] = page_num
+                        pending_ocr -= 1
 
-                # Read the OCR'd PDF page
-                ocr_reader = PdfReader(io.BytesIO(pdf_data))
-                ocr_page = ocr_reader.pages[0]
+                    # Finish the pages that are now in sequence
+                    while written < total_pages and (written in text_pages or written in results):
+                        if written not in text_pages:
+                            t = time.perf_counter()
+                            self._apply_result(output_doc, written, results.pop(written))
+                            self.timings["assemble"] += time.perf_counter() - t
+                        written += 1
+                        if progress_callback:
+                            progress_callback(written, total_pages)
 
-                writer.add_page(ocr_page)
+                    if in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            result, page_timings = future.result()
+                            results[in_flight.pop(future)] = result
+                            for stage, seconds in page_timings.items():
+                                self.timings[stage] += seconds
 
-            with open(output_pdf_path, "wb") as f:
-                writer.write(f)
+            t = time.perf_counter()
+            output_doc.save(output_pdf_path, garbage=3, deflate=True)
+            output_doc.close()
+            self.timings["assemble"] += time.perf_counter() - t
+            self.timings["total"] = time.perf_counter() - started
 
             return True, "OCR completed successfully."
 
+        except JobCancelled:
+            raise
         except Exception as e:
             return False, str(e)
@@ -1,101 +1,216 @@
 import sys
 import os
+import math
+import threading
 import uuid
 import fitz  # PyMuPDF
 from PIL import Image
 import io
-import copy
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .cache import LRUCache, thumbnail_size
+from .image_buffer import ImageBuffer
+from .hashing import file_content_hash
+from .jobs import JobCancelled
+from .compression import ImageRecompressor, TargetSizeSearch
+from .dedup import deduplicate_objects, page_content_hash
+
+# Fine-grained change notification sent to listeners after page_order is edited.
+#   'inserted': `count` pages now start at `index`
+#   'removed':  `count` pages starting at `index` are gone
+#   'moved':    the page at `index` now sits at `target`
+#   'rotated':  `count` pages starting at `index` were replaced in place (rotation, file reorder)
+#   'reset':    anything may have changed (clear)
+PageChange = namedtuple('PageChange', ['kind', 'index', 'count', 'target'], defaults=(0, 0, None))
+
+# One step of an edit: page_order[index:index + len(removed)] became `inserted`.
+# Undo history stores these instead of copies of page_order; the page tuples
+# are immutable, so removed and inserted entries are shared, not copied.
+Splice = namedtuple('Splice', ['index', 'removed', 'inserted'])
+
+# Outcome of load_pdf: `failed` lists (filepath, reason) for files that were skipped
+LoadResult = namedtuple('LoadResult', ['loaded_files', 'page_count', 'failed'])
+
+# Outcome of a target-size compress_pdf; `setting` is the (target_dpi, jpeg_quality) used, if any
+CompressResult = namedtuple('CompressResult', ['size', 'target_size', 'reached', 'setting'])
 
 class PDFManager:
-    def __init__(self):
-        self.doc = None  # Current PyMuPDF document (Physical Source)
+    # Memory budget for rendered thumbnails (raw RGB samples)
+    THUMBNAIL_CACHE_BYTES = 256 * 1024 * 1024
+    # Files opened/validated concurrently by load_pdf
+    MAX_LOAD_WORKERS = 8
+    # Longest run copied by one insert_pdf call, so export progress keeps moving
+    EXPORT_RUN_PAGES = 100
+    # Edits kept for undo
+    UNDO_LIMIT = 50
+
+    def __init__(self, thumbnail_cache_bytes=THUMBNAIL_CACHE_BYTES, disk_cache=None):
         self.filepath = None
-        # Page Order: list of (original_doc_page_index, file_name, file_id, rotation)
+        # Page Order: list of (page_index_in_source, file_name, file_id, rotation)
+        # Each file_id names an entry of self.sources, so nothing is copied between documents.
         self.page_order = []
-        self.thumbnails = {} # Cache: key=(original_index, rotation) -> value=img_data
+        # Cache: key=(file_id, page_index_in_source, rotation, scale) -> value=ImageBuffer
+        self.thumbnails = LRUCache(thumbnail_cache_bytes, sizeof=thumbnail_size)
+        # Optional persistent thumbnail cache (DiskThumbnailCache)
+        self.disk_cache = disk_cache
+        # file_id -> {'path', 'doc' (open fitz.Document), 'hash' of its contents}
+        self.sources = {}
+        # (file_id, page_index_in_source) -> content hash, filled by hash_pages
+        self.page_hashes = {}
         self.fitz = fitz
 
-        # Undo/Redo Stacks
+        # Undo/Redo Stacks: one list of Splices per edit
         self.history_stack = []
         self.redo_stack = []
-        self._is_undoing = False # Flag to prevent pushing to stack during undo/redo
 
-    def _save_state(self):
-        """Saves current state to history stack."""
-        if self._is_undoing:
+        # Callables receiving a list of PageChange after every edit
+        self._change_listeners = []
+
+    def add_change_listener(self, callback):
+        self._change_listeners.append(callback)
+
+    def remove_change_listener(self, callback):
+        if callback in self._change_listeners:
+            self._change_listeners.remove(callback)
+
+    def _notify(self, *changes):
+        for callback in list(self._change_listeners):
+            callback(list(changes))
+
+    def _record(self, splices):
+        """Applies an edit given as Splices, notifies listeners and makes it one undo step."""
+        if not splices:
             return
-        # Deep copy of page_order is enough as it defines the state
-        self.history_stack.append(copy.deepcopy(self.page_order))
+        self._notify(*self._apply_splices(splices))
+        self.history_stack.append(splices)
         self.redo_stack.clear() # Clear redo on new action
-
-        # Limit stack size to prevent memory issues (e.g., 50 actions)
-        if len(self.history_stack) > 50:
+        if len(self.history_stack) > self.UNDO_LIMIT:
             self.history_stack.pop(0)
 
+    def _apply_splices(self, splices):
+        changes = []
+        previous = None
+        for index, removed, inserted in splices:
+            self.page_order[index:index + len(removed)] = inserted
+            if (previous is not None and len(previous.removed) == 1 and not previous.inserted
+                    and not removed and list(inserted) == list(previous.removed)):
+                # Taken out and put back elsewhere: a move keeps the card
+                changes[-1] = PageChange('moved', previous.index, 1, index)
+            elif len(removed) == len(inserted):
+                changes.append(PageChange('rotated', index, len(inserted)))
+            else:
+                if removed:
+                    changes.append(PageChange('removed', index, len(removed)))
+                if inserted:
+                    changes.append(PageChange('inserted', index, len(inserted)))
+            previous = Splice(index, removed, inserted)
+        return changes
+
+    @staticmethod
+    def _invert(splices):
+        return [Splice(index, inserted, removed) for index, removed, inserted in reversed(splices)]
+
     def undo(self):
         if not self.history_stack:
             return False
-
-        self._is_undoing = True
-        try:
-            # Save current state to redo stack
-            self.redo_stack.append(copy.deepcopy(self.page_order))
-            # Pop previous state
-            self.page_order = self.history_stack.pop()
-            return True
-        finally:
-            self._is_undoing = False
+        splices = self.history_stack.pop()
+        self._notify(*self._apply_splices(self._invert(splices)))
+        self.redo_stack.append(splices)
+        return True
 
     def redo(self):
         if not self.redo_stack:
             return False
-
-        self._is_undoing = True
+        splices = self.redo_stack.pop()
+        self._notify(*self._apply_splices(splices))
+        self.history_stack.append(splices)
+        return True
+
+    def _open_source(self, filepath):
+        """Opens and validates one file. Runs on the load pool."""
+        # MuPDF reads file-backed documents on demand: opening only parses the
+        # xref and page tree, and each source stays open on its own.
+        doc = fitz.open(filepath)
         try:
-            self.history_stack.append(copy.deepcopy(self.page_order))
-            self.page_order = self.redo_stack.pop()
-            return True
-        finally:
-            self._is_undoing = False
-
-    def load_pdf(self, input_data):
-        self._save_state()
+            if not doc.is_pdf:
+                raise ValueError("não é um arquivo PDF")
+            if doc.needs_pass:
+                raise ValueError("arquivo protegido por senha")
+            if len(doc) == 0:
+                raise ValueError("arquivo sem páginas")
+            return {
+                'path': filepath,
+                'doc': doc,
+                # Keys the disk cache. Hashing reads the whole file, so it is left
+                # to the first cache lookup (see source_hash), off the load path.
+                'hash': None,
+                'hash_lock': threading.Lock(),
+            }
+        except Exception:
+            doc.close()
+            raise
+
+    def load_pdf(self, input_data, progress_callback=None):
+        """
+        Opens the files concurrently and appends their pages in input order.
+        progress_callback(done, total) is called as each file finishes.
+        """
         filepaths = input_data if isinstance(input_data, list) else [input_data]
-        total_loaded = 0
-
-        for filepath in filepaths:
-            try:
-                new_doc = fitz.open(filepath)
-                file_name = os.path.basename(filepath)
-                file_id = str(uuid.uuid4())
-
-                if self.doc is None:
-                    self.doc = new_doc
-                    self.filepath = filepath
-                    current_count = 0
-                else:
-                    current_count = len(self.doc)
-                    self.doc.insert_pdf(new_doc)
-
-                new_pages_count = len(new_doc)
-
-                # Add new page indices with 0 rotation default
-                for i in range(new_pages_count):
-                    self.page_order.append((current_count + i, file_name, file_id, 0))
-
-                total_loaded += 1
-
-            except Exception as e:
-                print(f"Error loading PDF {filepath}: {e}")
-
-        return len(self.page_order)
+        first_new_index = len(self.page_order)
+        results = {}
+        failed = []
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.MAX_LOAD_WORKERS, len(filepaths)))) as pool:
+            futures = {pool.submit(self._open_source, path): i for i, path in enumerate(filepaths)}
+            for done, future in enumerate(as_completed(futures), 1):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    failed.append((filepaths[i], str(e)))
+                if progress_callback:
+                    progress_callback(done, len(filepaths))
+
+        new_pages = []
+        for i in sorted(results):
+            source = results[i]
+            file_id = str(uuid.uuid4())
+            file_name = os.path.basename(source['path'])
+
+            if self.filepath is None:
+                self.filepath = source['path']
+
+            self.sources[file_id] = source
+            # Add new page indices with 0 rotation default
+            new_pages.extend((p, file_name, file_id, 0) for p in range(len(source['doc'])))
+
+        if new_pages:
+            self._record([Splice(first_new_index, (), tuple(new_pages))])
+
+        failed.sort(key=lambda item: filepaths.index(item[0]))
+        return LoadResult(len(results), len(self.page_order), failed)
 
     def rotate_page(self, page_index, angle=90):
-        if 0 <= page_index < len(self.page_order):
-            self._save_state()
-            idx, fname, fid, rot = self.page_order[page_index]
-            new_rot = (rot + angle) % 360
-            self.page_order[page_index] = (idx, fname, fid, new_rot)
+        self.rotate_pages([page_index], angle)
+
+    def rotate_pages(self, indices, angle=90):
+        """Rotates several pages as a single undo step, one Splice per contiguous run."""
+        splices = []
+        for start, stop in self._index_runs(indices):
+            removed = tuple(self.page_order[start:stop])
+            inserted = tuple((source_idx, fname, fid, (rot + angle) % 360) for source_idx, fname, fid, rot in removed)
+            splices.append(Splice(start, removed, inserted))
+        self._record(splices)
+
+    def _index_runs(self, indices):
+        """(start, stop) ranges covering the valid positions in `indices`, in order."""
+        runs = []
+        for idx in sorted({i for i in indices if 0 <= i < len(self.page_order)}):
+            if runs and runs[-1][1] == idx:
+                runs[-1][1] = idx + 1
+            else:
+                runs.append([idx, idx + 1])
+        return [tuple(run) for run in runs]
 
     def get_page_count(self):
         return len(self.page_order)
@@ -117,7 +232,6 @@ class PDFManager:
         return files
 
     def reorder_file(self, file_id, new_index):
-        self._save_state()
         current_files = self.get_files_in_order()
         if not (0 <= new_index < len(current_files)):
             return
@@ -143,105 +257,278 @@ class PDFManager:
             if fid in pages_by_file:
                 new_page_order.extend(pages_by_file[fid])
 
-        self.page_order = new_page_order
+        # Only the span between the unchanged head and tail goes into the history
+        old_page_order = self.page_order
+        head = 0
+        while head < len(new_page_order) and new_page_order[head] == old_page_order[head]:
+            head += 1
+        tail = len(new_page_order)
+        while tail > head and new_page_order[tail - 1] == old_page_order[tail - 1]:
+            tail -= 1
+        self._record([Splice(head, tuple(old_page_order[head:tail]), tuple(new_page_order[head:tail]))] if tail > head else [])
+
+    def get_render_source(self, page_index):
+        """
+        Returns (filepath, page_number, rotation) for a page, so background renderers
+        can rasterize it from their own document handle instead of sharing ours.
+        """
+        source_index, _, file_id, rotation = self.page_order[page_index]
+        return self.sources[file_id]['path'], source_index, rotation
+
+    def get_disk_source(self, page_index, scale=0.3):
+        """
+        What get_disk_key needs to key a page thumbnail, or None when the disk
+        cache is disabled. Cheap: background renderers turn it into the key.
+        """
+        if self.disk_cache is None:
+            return None
+        source_index, _, file_id, rotation = self.page_order[page_index]
+        return file_id, source_index, rotation, scale
+
+    def source_hash(self, file_id):
+        """Content hash of a source file, computed on first use. None if the file was removed."""
+        source = self.sources.get(file_id)
+        if source is None:
+            return None
+        with source['hash_lock']:
+            if source['hash'] is None:
+                source['hash'] = file_content_hash(source['path'])
+        return source['hash']
+
+    def make_disk_key(self, disk_source):
+        """Disk cache key for a get_disk_source() result. May read the whole file once."""
+        file_id, source_index, rotation, scale = disk_source
+        content_hash = self.source_hash(file_id)
+        if content_hash is None:
+            return None
+        return self.disk_cache.make_key(content_hash, source_index, rotation, scale)
+
+    def get_disk_key(self, page_index, scale=0.3):
+        """Key of the page thumbnail in the disk cache, or None when it is disabled."""
+        disk_source = self.get_disk_source(page_index, scale)
+        if disk_source is None:
+            return None
+        return self.make_disk_key(disk_source)
+
+    def get_thumbnail_key(self, page_index, scale=0.3):
+        source_index, _, file_id, rotation = self.page_order[page_index]
+        # Cache key includes rotation and scale, so several sizes can coexist
+        return (file_id, source_index, rotation, round(scale, 3))
+
+    def get_page_size(self, page_index):
+        """(width, height) of a page in points, with the session rotation applied, without loading it."""
+        source_index, _, file_id, rotation = self.page_order[page_index]
+        rect = self.sources[file_id]['doc'].page_cropbox(source_index)
+        if rotation % 180:
+            return rect.height, rect.width
+        return rect.width, rect.height
+
+    def get_fit_scale(self, page_index, width, height):
+        """Largest render scale (rounded down like thumbnail keys) at which the page fits in width x height pixels."""
+        page_width, page_height = self.get_page_size(page_index)
+        return math.floor(min(width / page_width, height / page_height) * 1000) / 1000
+
+    def get_cached_thumbnail(self, page_index, scale=0.3):
+        return self.thumbnails.get(self.get_thumbnail_key(page_index, scale))
+
+    def store_thumbnail(self, cache_key, img_data):
+        self.thumbnails.put(cache_key, img_data)
+
+    def get_page(self, page_index):
+        """Loads a page from its source document with the session rotation applied."""
+        source_index, _, file_id, rotation = self.page_order[page_index]
+        page = self.sources[file_id]['doc'].load_page(source_index)
+        page.set_rotation(rotation)
+        return page
 
     def get_thumbnail(self, page_index, scale=0.3):
         if not (0 <= page_index < len(self.page_order)):
              return None
 
-        original_index, _, _, rotation = self.page_order[page_index]
-
-        # Cache key includes rotation
-        cache_key = (original_index, rotation)
-
-        if cache_key in self.thumbnails and scale == 0.3:
-            return self.thumbnails[cache_key]
+        cache_key = self.get_thumbnail_key(page_index, scale)
 
-        page = self.doc.load_page(original_index)
+        cached = self.thumbnails.get(cache_key)
+        if cached is not None:
+            return cached
 
-        # Apply rotation
-        page.set_rotation(rotation)
+        disk_key = self.get_disk_key(page_index, scale)
+        if disk_key is not None:
+            cached = self.disk_cache.get_thumbnail(disk_key)
+            if cached is not None:
+                self.store_thumbnail(cache_key, cached)
+                return cached
 
+        page = self.get_page(page_index)
         pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        img_data = ImageBuffer.from_pixmap(pix)
 
-        img_data = {
-            "width": pix.width,
-            "height": pix.height,
-            "stride": pix.stride,
-            "samples": bytes(pix.samples),
-            "format": "RGB888"
-        }
-
-        if scale == 0.3:
-            self.thumbnails[cache_key] = img_data
+        self.store_thumbnail(cache_key, img_data)
+        if disk_key is not None:
+            self.disk_cache.put_thumbnail(disk_key, img_data)
         return img_data
 
     def get_page_image(self, page_index, scale=2.0):
-        original_index, _, _, rotation = self.page_order[page_index]
-        page = self.doc.load_page(original_index)
-        page.set_rotation(rotation)
-        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
-        return pix.tobytes("ppm")
+        page = self.get_page(page_index)
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        return ImageBuffer.from_pixmap(pix)
 
     def move_page(self, from_index, to_index):
         if 0 <= from_index < len(self.page_order) and 0 <= to_index < len(self.page_order):
-            self._save_state()
-            item = self.page_order.pop(from_index)
-            self.page_order.insert(to_index, item)
+            item = self.page_order[from_index]
+            self._record([Splice(from_index, (item,), ()), Splice(to_index, (), (item,))])
 
     def delete_pages(self, indices):
         """Soft delete: Remove from page_order only."""
         if not indices:
             return
 
-        self._save_state()
-
-        # Sort desc to delete safely
-        indices = sorted(indices, reverse=True)
+        # One Splice per contiguous run, last run first so indices stay valid in order
+        runs = reversed(self._index_runs(indices))
+        self._record([Splice(start, tuple(self.page_order[start:stop]), ()) for start, stop in runs])
+
+    def _page_runs(self, indices):
+        """
+        Groups the given page_order positions into runs of consecutive pages of
+        the same source with the same rotation: (file_id, from_page, to_page, rotation).
+        """
+        # Copy first: exports run on worker threads while the UI may edit the list
+        order = list(self.page_order)
+        run = None
         for idx in indices:
-            if 0 <= idx < len(self.page_order):
-                del self.page_order[idx]
-
-    def save_pdf(self, output_path):
+            if not 0 <= idx < len(order):
+                continue
+            source_idx, _, file_id, rotation = order[idx]
+            if (run is not None and run[0] == file_id and run[2] + 1 == source_idx
+                    and run[3] == rotation and run[2] - run[1] + 1 < self.EXPORT_RUN_PAGES):
+                run[2] = source_idx
+                continue
+            if run is not None:
+                yield tuple(run)
+            run = [file_id, source_idx, source_idx, rotation]
+        if run is not None:
+            yield tuple(run)
+
+    def _build_document(self, indices, progress_callback=None, cancel_token=None):
+        """
+        Copies the pages at `indices` into a new document, one insert_pdf per run.
+        Safe to call from a worker thread: the page list is snapshotted up front
+        and the sources are opened again, so the UI can keep using its handles.
+        """
+        runs = list(self._page_runs(indices))
+        paths = {file_id: self.sources[file_id]['path'] for file_id, _, _, _ in runs}
+        source_docs = {}
         output_doc = fitz.open()
-        for item in self.page_order:
-            original_idx, _, _, rotation = item
-
-            # We must load the page, rotate it, and then insert?
-            # insert_pdf copies the page. If we want to save rotation, we should ensure the source is rotated
-            # OR we use insert_pdf with rotation logic.
-            # fitz.Document.insert_pdf does NOT have a rotation param per page easily (it merges docs).
-            # Easier: Create a temp single-page doc, rotate it, then insert.
-            # OR: simply set rotation on self.doc page before inserting (but that modifies self.doc state? Yes).
-            # But we are allowed to modify self.doc state as long as we reset it? No, that's risky.
-
-            # Better: self.doc.insert_pdf copies the page stream.
-            # Rotation is a page attribute.
-
-            output_doc.insert_pdf(self.doc, from_page=original_idx, to_page=original_idx, rotate=rotation)
-
-        output_doc.save(output_path)
-        output_doc.close()
-
-    def split_pdf(self, selected_indices, output_path):
-        output_doc = fitz.open()
-        for idx in selected_indices:
-            if 0 <= idx < len(self.page_order):
-                original_idx, _, _, rotation = self.page_order[idx]
-                output_doc.insert_pdf(self.doc, from_page=original_idx, to_page=original_idx, rotate=rotation)
-
+        total = sum(to_page - from_page + 1 for _, from_page, to_page, _ in runs)
+        done = 0
+        try:
+            for file_id, from_page, to_page, rotation in runs:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                source_doc = source_docs.get(file_id)
+                if source_doc is None:
+                    source_doc = source_docs[file_id] = fitz.open(paths[file_id])
+                # insert_pdf copies the pages from their source document.
+                # Rotation is a page attribute: `rotate` sets it on the copies.
+                # Objects shared between runs of the same source are copied once.
+                output_doc.insert_pdf(source_doc, from_page=from_page, to_page=to_page, rotate=rotation)
+                done += to_page - from_page + 1
+                if progress_callback:
+                    progress_callback(done, total)
+        except Exception:
+            output_doc.close()
+            raise
+        finally:
+            for source_doc in source_docs.values():
+                source_doc.close()
+        return output_doc
+
+    def save_pdf(self, output_path, progress_callback=None, cancel_token=None, deduplicate=False):
+        """
+        Saves every page in order. With `deduplicate`, images and fonts repeated
+        across the source files (logos, letterheads) are written once.
+        """
+        output_doc = self._build_document(range(len(self.page_order)), progress_callback, cancel_token)
+        try:
+            if deduplicate:
+                deduplicate_objects(output_doc, cancel_token)
+                output_doc.save(output_path, garbage=2)
+            else:
+                output_doc.save(output_path)
+        finally:
+            output_doc.close()
+
+    def hash_pages(self, progress_callback=None, cancel_token=None):
+        """
+        Computes the content hash of every page that does not have one yet, for
+        find_duplicate_pages. Safe to call from a worker thread: the sources are
+        opened again. Returns the number of pages hashed.
+        """
+        order = list(self.page_order)
+        missing = sorted({(file_id, source_idx) for source_idx, _, file_id, _ in order} - set(self.page_hashes))
+        paths = {file_id: self.sources[file_id]['path'] for file_id, _ in missing}
+        docs = {}
+        stream_digests = {}
+        try:
+            for done, (file_id, source_idx) in enumerate(missing, 1):
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                doc = docs.get(file_id)
+                if doc is None:
+                    doc = docs[file_id] = fitz.open(paths[file_id])
+                    stream_digests = {} # xrefs are per document
+                self.page_hashes[(file_id, source_idx)] = page_content_hash(doc, source_idx, stream_digests)
+                if progress_callback:
+                    progress_callback(done, len(missing))
+        finally:
+            for doc in docs.values():
+                doc.close()
+        return len(missing)
+
+    def find_duplicate_pages(self):
+        """
+        {index: index of the first page with the same content and rotation} for
+        the pages already hashed by hash_pages.
+        """
+        first_index = {}
+        duplicates = {}
+        for index, (source_idx, _, file_id, rotation) in enumerate(self.page_order):
+            content_hash = self.page_hashes.get((file_id, source_idx))
+            if content_hash is None:
+                continue
+            first = first_index.setdefault((content_hash, rotation), index)
+            if first != index:
+                duplicates[index] = first
+        return duplicates
+
+    def split_pdf(self, selected_indices, output_path, progress_callback=None, cancel_token=None):
+        indices = [idx for idx in selected_indices if 0 <= idx < len(self.page_order)]
+        output_doc = self._build_document(indices, progress_callback, cancel_token)
         output_doc.save(output_path)
         output_doc.close()
 
     def clear_session(self):
-        self.doc = None
+        for source in self.sources.values():
+            source['doc'].close()
         self.filepath = None
         self.page_order = []
-        self.thumbnails = {}
+        self.thumbnails.clear()
+        self.sources = {}
+        self.page_hashes = {}
         self.history_stack = []
         self.redo_stack = []
+        self._notify(PageChange('reset'))
+
+    def compress_pdf(self, output_path, level="medium", progress_callback=None, cancel_token=None, target_size=None,
+                     target_dpi=ImageRecompressor.TARGET_DPI):
+        """
+        Saves a compacted copy. "high" also resamples images to `target_dpi` at
+        their displayed size; "target" searches for settings that fit `target_size` bytes.
+        """
+        if level == "target":
+            if not isinstance(target_size, (int, float)) or target_size <= 0:
+                raise ValueError("tamanho alvo ausente ou inválido")
+            return self._compress_to_size(output_path, target_size, progress_callback, cancel_token)
 
-    def compress_pdf(self, output_path, level="medium"):
         deflate = True
         garbage = 0
         clean = False
@@ -256,58 +543,69 @@ class PDFManager:
             deflate = True
             clean = True
 
-        subset_doc = fitz.open()
-        for item in self.page_order:
-            original_idx, _, _, rotation = item
-            subset_doc.insert_pdf(self.doc, from_page=original_idx, to_page=original_idx, rotate=rotation)
+        subset_doc = self._build_document(range(len(self.page_order)), progress_callback, cancel_token)
 
         if level == "high":
-            processed_xrefs = set()
             try:
-                for page_num in range(len(subset_doc)):
-                    page = subset_doc[page_num]
-                    image_list = page.get_images()
-
-                    for img in image_list:
-                        xref = img[0]
-                        if xref <= 0 or xref in processed_xrefs:
-                            continue
-                        processed_xrefs.add(xref)
-
-                        try:
-                            pix = fitz.Pixmap(subset_doc, xref)
-                            if pix.n - pix.alpha > 3:
-                                pix = fitz.Pixmap(fitz.csRGB, pix)
-                            if pix.alpha:
-                                pix = fitz.Pixmap(pix, 0)
-
-                            max_dim = 1500
-                            should_downsample = pix.width > max_dim or pix.height > max_dim
-
-                            if should_downsample:
-                                scale = max_dim / max(pix.width, pix.height)
-                                new_width = int(pix.width * scale)
-                                new_height = int(pix.height * scale)
-                                new_pix = fitz.Pixmap(pix, new_width, new_height)
-                            else:
-                                new_pix = fitz.Pixmap(pix)
-
-                            stream = new_pix.tobytes("jpeg", jpg_quality=50)
-
-                            subset_doc.update_stream(xref, stream, compress=False)
-                            subset_doc.xref_set_key(xref, "Width", str(new_pix.width))
-                            subset_doc.xref_set_key(xref, "Height", str(new_pix.height))
-                            subset_doc.xref_set_key(xref, "Filter", "/DCTDecode")
-                            subset_doc.xref_set_key(xref, "BitsPerComponent", "8")
-                            if new_pix.n <= 2:
-                                subset_doc.xref_set_key(xref, "ColorSpace", "/DeviceGray")
-                            else:
-                                subset_doc.xref_set_key(xref, "ColorSpace", "/DeviceRGB")
-                        except Exception as e:
-                            print(f"Failed to compress image xref {xref}: {e}")
-                            continue
+                # Repeated images are then recompressed once
+                deduplicate_objects(subset_doc, cancel_token)
+                ImageRecompressor(target_dpi=target_dpi).recompress(subset_doc, progress_callback, cancel_token)
+            except JobCancelled:
+                subset_doc.close()
+                raise
             except Exception as e:
-                pass
+                print(f"Image recompression stopped: {e}")
 
         subset_doc.save(output_path, garbage=garbage, deflate=deflate, clean=clean)
         subset_doc.close()
+
+    # Aim this far below the target, the size estimates are approximate
+    TARGET_SIZE_MARGIN = 0.95
+
+    def _compress_to_size(self, output_path, target_size, progress_callback=None, cancel_token=None):
+        """
+        Recompresses images with the mildest settings expected to bring the file
+        under `target_size` bytes. If the saved result is still too big, steps
+        down the quality ladder until it fits or the ladder runs out.
+        """
+        save_options = dict(garbage=4, deflate=True, clean=True)
+        doc = self._build_document(range(len(self.page_order)), progress_callback, cancel_token)
+        try:
+            deduplicate_objects(doc, cancel_token)
+            # Retries start over from this copy: rebuilding would pick up pages
+            # edited meanwhile and redo the merge and deduplication every step.
+            # Saved without garbage collection, so xrefs match what search saw.
+            pristine = doc.tobytes()
+            data = doc.tobytes(**save_options)
+            setting = None
+            if len(data) > target_size:
+                search = TargetSizeSearch(doc)
+                # Everything that is not an image stream stays about the same size.
+                # Uncompressed image streams get deflated on save, hence the clamp.
+                overhead = max(0, len(data) - search.original_bytes)
+                image_budget = target_size * self.TARGET_SIZE_MARGIN - overhead
+                step = search.choose(image_budget)
+
+                recompressed = False
+                while True:
+                    if cancel_token is not None:
+                        cancel_token.raise_if_cancelled()
+                    setting = search.ladder[step]
+                    if recompressed:
+                        # Start over from the original images for the next step
+                        doc.close()
+                        doc = fitz.open("pdf", pristine)
+                    search.recompressor(step).recompress(doc, progress_callback, cancel_token)
+                    recompressed = True
+                    data = doc.tobytes(**save_options)
+                    if len(data) <= target_size or step == len(search.ladder) - 1:
+                        break
+                    # Scale the budget by how far off the estimate was and search again
+                    actual = max(1, len(data) - overhead)
+                    step = max(step + 1, search.choose(image_budget * search.estimate(step) / actual))
+        finally:
+            doc.close()
+
+        with open(output_path, "wb") as f:
+            f.write(data)
+        return CompressResult(len(data), target_size, len(data) <= target_size, setting)
@@ -1,8 +1,11 @@
 import sys
+import multiprocessing
 from PyQt6.QtWidgets import QApplication
 from .ui.main_window import MainWindow
 
 def main():
+    # OCR runs on a process pool; required for frozen (PyInstaller) builds on Windows
+    multiprocessing.freeze_support()
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
@@ -1,12 +1,75 @@
 from PyQt6.QtWidgets import (
     QWidget, QScrollArea, QGridLayout, QVBoxLayout, QApplication, QLabel, QHBoxLayout, QFrame, QPushButton, QSlider
 )
-from PyQt6.QtCore import pyqtSignal, Qt, QMimeData, QPoint, QTimer, QRect
+from PyQt6.QtCore import pyqtSignal, Qt, QMimeData, QPoint, QTimer, QRect, QEvent
 from PyQt6.QtGui import QDrag, QPixmap, QImage, QPainter, QPen, QBrush, QColor
 from .widgets.thumbnail import Thumbnail
+from .thumbnail_renderer import ThumbnailRenderer, image_from_buffer
+from ..core.image_buffer import ImageBuffer
 import os
 import math
 
+class GridGeometry:
+    """
+    Pure geometry of the pages grid. Cards are positioned from this instead of a
+    QGridLayout, so only the visible ones need to exist as widgets.
+    """
+    def __init__(self, count=0, columns=4, card_width=220, card_height=280, spacing=20, margin=20):
+        self.count = count
+        self.columns = columns
+        self.card_width = card_width
+        self.card_height = card_height
+        self.spacing = spacing
+        self.margin = margin
+
+    @property
+    def rows(self):
+        return math.ceil(self.count / self.columns) if self.count else 0
+
+    def card_rect(self, index):
+        row, col = divmod(index, self.columns)
+        x = self.margin + col * (self.card_width + self.spacing)
+        y = self.margin + row * (self.card_height + self.spacing)
+        return QRect(x, y, self.card_width, self.card_height)
+
+    def content_width(self):
+        return 2 * self.margin + self.columns * self.card_width + (self.columns - 1) * self.spacing
+
+    def content_height(self):
+        if not self.rows:
+            return 0
+        return 2 * self.margin + self.rows * self.card_height + (self.rows - 1) * self.spacing
+
+    def _row_at(self, y):
+        return int((y - self.margin) // (self.card_height + self.spacing))
+
+    def _col_at(self, x):
+        return int((x - self.margin) // (self.card_width + self.spacing))
+
+    def index_range(self, top, bottom, overscan_rows=0):
+        """Indices of cards intersecting the vertical band [top, bottom]."""
+        if not self.count:
+            return range(0)
+        first_row = max(0, self._row_at(top) - overscan_rows)
+        last_row = min(self.rows - 1, self._row_at(bottom) + overscan_rows)
+        if last_row < first_row:
+            return range(0)
+        return range(first_row * self.columns, min(self.count, (last_row + 1) * self.columns))
+
+    def nearest_index(self, pos):
+        if not self.count:
+            return -1
+        row = max(0, min(self.rows - 1, self._row_at(pos.y())))
+        col = max(0, min(self.columns - 1, self._col_at(pos.x())))
+        return min(row * self.columns + col, self.count - 1)
+
+    def indices_in_rect(self, rect):
+        indices = set()
+        for index in self.index_range(rect.top(), rect.bottom()):
+            if rect.intersects(self.card_rect(index)):
+                indices.add(index)
+        return indices
+
 class DocumentCard(QFrame):
     """
     Widget representing a single document (file) in 'View Documents' mode.
@@ -83,7 +146,7 @@ class ContainerWidget(QWidget):
     def __init__(self, mode='pages', parent=None):
         super().__init__(parent)
         self.mode = mode
-        self.thumbnails_ref = []
+        self.grid = GridGeometry()
         self.docs_ref = []
         self.selection_active = False
         self.start_point = QPoint()
@@ -143,8 +206,8 @@ class ContainerWidget(QWidget):
             # painter.setPen(QColor(0, 154, 62))
             # painter.drawText(self.drop_indicator_rect, Qt.AlignmentFlag.AlignCenter, "+")
 
-    def set_thumbnails(self, thumbnails):
-        self.thumbnails_ref = thumbnails
+    def set_grid(self, grid):
+        self.grid = grid
 
     def set_docs(self, docs):
         self.docs_ref = docs
@@ -207,67 +270,41 @@ class ContainerWidget(QWidget):
             self.handle_doc_drop(event)
 
     def _calculate_drop_ghost(self, pos, source_index=-1):
-        if not self.thumbnails_ref:
+        if not self.grid.count:
             return -1, QRect()
 
-        # Find closest thumbnail
-        closest_thumb = None
-        min_dist = float('inf')
-
-        for thumb in self.thumbnails_ref:
-            center = thumb.geometry().center()
-            dist = (pos - center).manhattanLength()
-            if dist < min_dist:
-                min_dist = dist
-                closest_thumb = thumb
-
-        if closest_thumb:
-            if closest_thumb.index == source_index:
-                 # Dropping on self
-                 return source_index, QRect()
-
-            geo = closest_thumb.geometry()
-
-            # Determine insertion point (before or after)
-            insert_after = pos.x() > geo.center().x()
-
-            # Ghost Logic: We want to show WHERE the item will exist.
-            # In a grid, this is tricky because everything shifts.
-            # Simplification: Draw the ghost box OVER the target position.
-
-            if insert_after:
-                target_index = closest_thumb.index + 1
-                # Logic to find where "Next" is visually is complex in Grid.
-                # Simplified: Draw a box to the right, or if end of row, start of next row.
-                # For now, let's just draw the "Insert Bar" transformed into a "Ghost Box"
-                # Actually, let's just highlight the GAP.
+        # Closest card, resolved from the grid geometry (off-screen cards have no widget)
+        closest_index = self.grid.nearest_index(pos)
+        if closest_index == source_index:
+            # Dropping on self
+            return source_index, QRect()
 
-                # Ghost Box: Same size as thumbnail, positioned slightly offset?
-                # No, user wants "Visual space... or ghost indicator".
+        geo = self.grid.card_rect(closest_index)
 
-                # Let's draw a Box BETWEEN items.
-                ghost_width = 20
-                ghost_height = geo.height()
+        # Determine insertion point (before or after)
+        insert_after = pos.x() > geo.center().x()
 
-                if insert_after:
-                     ghost_rect = QRect(geo.right(), geo.top(), ghost_width, ghost_height)
-                else:
-                     ghost_rect = QRect(geo.left() - ghost_width, geo.top(), ghost_width, ghost_height)
-
-                return target_index, ghost_rect
-            else:
-                target_index = closest_thumb.index
-                ghost_rect = QRect(geo.left() - 20, geo.top(), 20, geo.height())
-                return target_index, ghost_rect
+        # Ghost Box: a thin box drawn in the gap between cards
+        ghost_width = 20
+        if insert_after:
+            target_index = closest_index + 1
+            ghost_rect = QRect(geo.right(), geo.top(), ghost_width, geo.height())
+        else:
+            target_index = closest_index
+            ghost_rect = QRect(geo.left() - ghost_width, geo.top(), ghost_width, geo.height())
 
-        return -1, QRect()
+        return target_index, ghost_rect
 
     def handle_file_drop(self, event):
         files = []
         for url in event.mimeData().urls():
             if url.isLocalFile():
                 path = url.toLocalFile()
-                if path.lower().endswith('.pdf'):
+                if os.path.isdir(path):
+                    # Dropped folder: its PDFs, in name order
+                    files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                                 if name.lower().endswith('.pdf'))
+                elif path.lower().endswith('.pdf'):
                     files.append(path)
 
         if files:
@@ -351,11 +388,40 @@ class EmptyState(QFrame):
         sub_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         layout.addWidget(sub_label)
 
+def _remap_index(index, change):
+    """Where `index` ends up after a PageChange, or None if its page was removed."""
+    if change.kind == 'inserted':
+        return index + change.count if index >= change.index else index
+    if change.kind == 'removed':
+        if index < change.index:
+            return index
+        if index < change.index + change.count:
+            return None
+        return index - change.count
+    if change.kind == 'moved':
+        src, dst = change.index, change.target
+        if index == src:
+            return dst
+        if src < index <= dst:
+            return index - 1
+        if dst <= index < src:
+            return index + 1
+    return index
+
 class CenterCanvas(QWidget):
+    # Extra rows materialized above/below the viewport so scrolling doesn't show blank cards
+    OVERSCAN_ROWS = 2
+    # Card size at the default zoom, and the padding around its image (sides, top + page number)
+    CARD_SIZE = (220, 280)
+    CARD_PADDING = (20, 40)
+    # Zoom factors thumbnails are rendered for; a card uses the smallest tier at least as big as itself
+    THUMBNAIL_TIERS = (0.5, 1.0, 1.5, 2.0)
+
     page_selected = pyqtSignal(list)
     page_order_changed = pyqtSignal(int, int)
     request_viewer = pyqtSignal(int)
     zoom_changed = pyqtSignal(int)
+    _pages_changed = pyqtSignal(object) # list of PageChange
 
     def __init__(self, main_window):
         super().__init__()
@@ -363,20 +429,36 @@ class CenterCanvas(QWidget):
         self.main_window = main_window
         self.view_mode = 'pages'
 
-        self.thumbnails = []
+        # Virtualized grid: only cards near the viewport exist as widgets
+        self.grid = GridGeometry()
+        self.visible_cards = {} # index -> Thumbnail
+        self.card_pool = [] # hidden Thumbnails ready for reuse
         self.doc_cards = []
         self.selected_indices = set()
         self.last_clicked_index = -1
+        # index -> index of the page it duplicates; None until the user looks for duplicates
+        self.duplicates = None
 
         # Grid Dynamic State
         self.zoom_level = 50 # 0 to 100
         self.current_columns = 4
 
-        # Lazy Loading State
-        self.loading_queue = []
-        self.loading_timer = QTimer()
-        self.loading_timer.timeout.connect(self._process_loading_queue)
-        self.loading_timer.setInterval(10) # 10ms for responsiveness
+        # Lazy Loading: thumbnails are rasterized on a thread pool
+        self.renderer = ThumbnailRenderer(self.main_window.pdf_manager, parent=self)
+        self.renderer.thumbnail_ready.connect(self._on_thumbnail_ready)
+
+        # While the zoom slider moves cards are only resized and moved; thumbnails
+        # for the new size are requested once it has rested for a moment
+        self.zoom_timer = QTimer(self)
+        self.zoom_timer.setSingleShot(True)
+        self.zoom_timer.setInterval(200)
+        self.zoom_timer.timeout.connect(self._render_visible_cards)
+        self.zoom_anchor = None # (index, offset in rows) kept at the top of the viewport during a zoom
+
+        # Edits are applied as diffs. Going through a signal queues the ones made
+        # on worker threads (load, rotate) onto the GUI thread.
+        self._pages_changed.connect(self._apply_page_changes)
+        self.main_window.pdf_manager.add_change_listener(self._pages_changed.emit)
 
         self.init_ui()
 
@@ -417,7 +499,7 @@ class CenterCanvas(QWidget):
         self.zoom_slider = QSlider(Qt.Orientation.Horizontal)
         self.zoom_slider.setRange(10, 100)
         self.zoom_slider.setValue(50)
-        self.zoom_slider.setWidth(150)
+        self.zoom_slider.setFixedWidth(150)
         self.zoom_slider.valueChanged.connect(self.set_zoom)
         toolbar_layout.addWidget(self.zoom_slider)
 
@@ -448,6 +530,10 @@ class CenterCanvas(QWidget):
         main_layout.addWidget(self.scroll_area)
         self.container.setAcceptDrops(True)
 
+        # Materialize cards as the viewport moves or resizes
+        self.scroll_area.verticalScrollBar().valueChanged.connect(self._update_visible_cards)
+        self.scroll_area.viewport().installEventFilter(self)
+
         self.refresh_thumbnails()
 
     def set_zoom(self, value):
@@ -460,11 +546,16 @@ class CenterCanvas(QWidget):
 
         new_cols = int(6 - (value - 10) * (4 / 90))
         new_cols = max(1, min(6, new_cols))
+        self.current_columns = new_cols
+
+        if self.view_mode == 'pages':
+            self.zoom_timer.start()
+            self._relayout()
 
-        if new_cols != self.current_columns:
-            self.current_columns = new_cols
-            if self.view_mode == 'pages':
-                self.refresh_thumbnails()
+    def eventFilter(self, obj, event):
+        if obj is self.scroll_area.viewport() and event.type() == QEvent.Type.Resize:
+            self._update_visible_cards()
+        return super().eventFilter(obj, event)
 
     def style_toggle_button(self, btn):
         btn.setStyleSheet("""
@@ -505,9 +596,10 @@ class CenterCanvas(QWidget):
         self.btn_view_pages.setChecked(mode == 'pages')
         self.btn_view_docs.setChecked(mode == 'docs')
         self.container.mode = mode
+        self._release_all_cards()
 
         old_layout = self.container.layout()
-        if old_layout:
+        if old_layout is not None:
              self._clear_layout(old_layout)
              QWidget().setLayout(old_layout)
 
@@ -525,31 +617,31 @@ class CenterCanvas(QWidget):
         self.refresh_thumbnails()
 
     def handle_reorder(self, src, dst):
+        # The grid is updated by the resulting PageChange
         self.page_order_changed.emit(src, dst)
-        self.refresh_thumbnails()
 
     def handle_doc_reorder(self, file_id, new_index):
         self.main_window.pdf_manager.reorder_file(file_id, new_index)
-        self.refresh_thumbnails()
 
     def refresh_thumbnails(self):
-        self.loading_timer.stop()
-        self.loading_queue = []
+        self.renderer.cancel_all()
 
         layout = self.container.layout()
         if layout:
             self._clear_layout(layout)
 
-        self.thumbnails = []
+        self._release_all_cards()
         self.doc_cards = []
         self.selected_indices.clear()
 
         count = self.main_window.pdf_manager.get_page_count()
+        self.grid = GridGeometry(count, self.current_columns)
+        self.container.setMinimumSize(0, 0)
 
         if count == 0:
             empty_state = EmptyState()
             layout.addWidget(empty_state)
-            self.container.set_thumbnails([])
+            self.container.set_grid(self.grid)
             self.container.set_docs([])
             return
 
@@ -559,104 +651,272 @@ class CenterCanvas(QWidget):
             self._render_docs_view(layout)
 
     def _setup_pages_grid(self, count, layout):
-        # Scale thumbnails based on columns
-        # Screen Width?
-        # Fixed logic for now: Columns determines placement.
-        # Thumbnail widget handles its own internal scaling (Card Size)
-        # But we should probably scale the widget size if zoom is huge.
-        # For now, keeping widget size fixed (220x280) but changing grid density.
-
-        # User requirement: "Change thumbnail size in real time".
-        # Currently Thumbnail is FixedSize 220x280.
-        # We need to make Thumbnail scalable.
-
-        # Update: In `Thumbnail` I set fixed size. I should probably remove fixed size there
-        # or update it here.
-
-        # Let's adjust scale factor.
-        scale_factor = (self.zoom_level / 50.0) # 0.2 to 2.0
-        base_w, base_h = 220, 280
-        scaled_w = int(base_w * scale_factor)
-        scaled_h = int(base_h * scale_factor)
-
-        row = 0
-        col = 0
-        columns = self.current_columns
-
-        for i in range(count):
-            # Create Thumbnail with None data (Placeholder)
-            # Pass size hint?
-            thumb = Thumbnail(i, None)
-            thumb.setFixedSize(scaled_w, scaled_h)
+        self._apply_grid_size()
+        self.container.set_grid(self.grid)
+        self._update_visible_cards()
+
+    def _apply_grid_size(self):
+        # Card size follows the zoom slider; columns determine placement.
+        scale_factor = self._zoom_factor()
+        base_w, base_h = self.CARD_SIZE
+        self.grid.columns = self.current_columns
+        self.grid.card_width = int(base_w * scale_factor)
+        self.grid.card_height = int(base_h * scale_factor)
+
+        # The container only reserves the full grid area; cards are placed manually
+        self.container.setMinimumSize(self.grid.content_width(), self.grid.content_height())
+
+    def _relayout(self):
+        """
+        Applies a new zoom to the existing cards: they are resized and moved,
+        and paint their current image stretched. Nothing is rendered here.
+        """
+        if not self.grid.count:
+            return
+        # Keep the card at the top of the viewport there, for the whole slider drag
+        v_bar = self.scroll_area.verticalScrollBar()
+        if self.zoom_anchor is None:
+            top = v_bar.value()
+            anchor = self.grid.index_range(top, top)
+            anchor = anchor.start if anchor else 0
+            self.zoom_anchor = (anchor, (top - self.grid.card_rect(anchor).top()) / (self.grid.card_height + self.grid.spacing))
+        anchor, row_offset = self.zoom_anchor
+
+        self._apply_grid_size()
+        for index, thumb in self.visible_cards.items():
+            self._place_card(thumb, index)
+
+        # The scroll range only follows the container's new size after a layout pass
+        QApplication.sendPostedEvents(self.scroll_area.viewport(), QEvent.Type.LayoutRequest)
+        v_bar.setValue(self.grid.card_rect(anchor).top() + round(row_offset * (self.grid.card_height + self.grid.spacing)))
+        self._update_visible_cards()
+
+    def _render_visible_cards(self):
+        """Zoom settled: asks for the thumbnail tier of the new card size."""
+        self.zoom_anchor = None
+        if self.view_mode != 'pages':
+            return
+        on_screen = self._visible_range(overscan_rows=0)
+        for index, thumb in self.visible_cards.items():
+            priority = ThumbnailRenderer.PRIORITY_VISIBLE if index in on_screen else ThumbnailRenderer.PRIORITY_PREFETCH
+            # Cached thumbnails come back synchronously; only missing tiers are rendered
+            self._request_card_image(thumb, index, priority)
 
-            thumb.clicked.connect(self.on_thumbnail_clicked)
-            thumb.double_clicked.connect(self.on_thumbnail_double_clicked)
+    def _apply_page_changes(self, changes):
+        count = self.main_window.pdf_manager.get_page_count()
+        if self.duplicates is not None:
+            # Cheap: only compares the page hashes already computed
+            self.duplicates = self.main_window.pdf_manager.find_duplicate_pages()
 
-            layout.addWidget(thumb, row, col)
-            self.thumbnails.append(thumb)
+        # Document cards are cheap to rebuild; so are transitions from/to the empty state
+        if self.view_mode != 'pages' or count == 0 or self.grid.count == 0:
+            self.refresh_thumbnails()
+            return
 
-            # Add to lazy load queue
-            self.loading_queue.append(thumb)
+        for change in changes:
+            self._remap_cards(change)
 
-            col += 1
-            if col >= columns:
-                col = 0
-                row += 1
+        self.grid.count = count
+        self.container.setMinimumSize(self.grid.content_width(), self.grid.content_height())
+        self.selected_indices = {i for i in self.selected_indices if i < count}
 
-        self.container.set_thumbnails(self.thumbnails)
+        self._update_visible_cards()
+        self._reconcile_cards()
 
-        # Start Lazy Loading
-        self.loading_timer.start()
+    def _remap_cards(self, change):
+        if change.kind in ('rotated', 'reset'):
+            return # Indices unchanged, _reconcile_cards picks up the new content
 
-    def _process_loading_queue(self):
-        if not self.loading_queue:
-            self.loading_timer.stop()
+        remapped = {}
+        for index, thumb in self.visible_cards.items():
+            new_index = _remap_index(index, change)
+            if new_index is None:
+                self._recycle_card(thumb)
+            else:
+                remapped[new_index] = thumb
+        self.visible_cards = remapped
+
+        selected = (_remap_index(i, change) for i in self.selected_indices)
+        self.selected_indices = {i for i in selected if i is not None}
+        if self.last_clicked_index != -1:
+            new_last = _remap_index(self.last_clicked_index, change)
+            self.last_clicked_index = -1 if new_last is None else new_last
+
+    def _reconcile_cards(self):
+        """Moves shifted cards and re-requests only those whose page content changed."""
+        pdf_manager = self.main_window.pdf_manager
+        for index, thumb in self.visible_cards.items():
+            if thumb.index != index:
+                thumb.index = index
+                self._place_card(thumb, index)
+                thumb.update()
+            thumb.set_selected(index in self.selected_indices)
+            thumb.set_duplicate_of(self._duplicate_of(index))
+
+            # Compare the page only: the card may show any tier of it
+            if thumb.page_key is None or thumb.page_key[:3] != pdf_manager.get_thumbnail_key(index)[:3]:
+                self.renderer.cancel(thumb.page_key)
+                thumb.image_pixmap = None
+                thumb.update()
+                self._request_card_image(thumb, index)
+
+    def _visible_range(self, overscan_rows=OVERSCAN_ROWS):
+        top = self.scroll_area.verticalScrollBar().value()
+        bottom = top + self.scroll_area.viewport().height()
+        return self.grid.index_range(top, bottom, overscan_rows)
+
+    def _update_visible_cards(self):
+        if self.view_mode != 'pages' or not self.grid.count:
             return
 
-        # Load batch of 5
-        for _ in range(5):
-            if not self.loading_queue:
-                break
+        wanted = self._visible_range()
+        on_screen = self._visible_range(overscan_rows=0)
 
-            thumb = self.loading_queue.pop(0)
+        for index in [i for i in self.visible_cards if i not in wanted]:
+            self._release_card(index)
 
-            # Fetch data
-            # Calculate quality scale based on zoom?
-            # Default 0.3 is good for thumbnails.
-            img_data = self.main_window.pdf_manager.get_thumbnail(thumb.index, scale=0.3)
+        for index in wanted:
+            if index not in self.visible_cards:
+                priority = ThumbnailRenderer.PRIORITY_VISIBLE if index in on_screen else ThumbnailRenderer.PRIORITY_PREFETCH
+                self._acquire_card(index, priority)
 
-            # Manually inject data into Thumbnail (Need to add a method to Thumbnail or recreate)
-            # Recreating is bad because it's already in layout.
-            # I will modify Thumbnail to allow setting data later.
-            # For now, I'll access internal property or re-init logic.
+    def _acquire_card(self, index, priority=ThumbnailRenderer.PRIORITY_VISIBLE):
+        if self.card_pool:
+            thumb = self.card_pool.pop()
+            thumb.set_index(index)
+        else:
+            thumb = Thumbnail(index, None)
+            thumb.setParent(self.container)
+            thumb.clicked.connect(self.on_thumbnail_clicked)
+            thumb.double_clicked.connect(self.on_thumbnail_double_clicked)
 
-            # Refactor Thumbnail to have set_data
-            self._update_thumbnail_data(thumb, img_data)
+        self._place_card(thumb, index)
+        thumb.set_selected(index in self.selected_indices)
+        thumb.set_duplicate_of(self._duplicate_of(index))
+        thumb.show()
+        self.visible_cards[index] = thumb
+
+        self._request_card_image(thumb, index, priority)
+        return thumb
+
+    def _duplicate_of(self, index):
+        return self.duplicates.get(index) if self.duplicates is not None else None
+
+    def set_duplicates(self, duplicates):
+        """Marks the cards of pages that repeat an earlier one; kept up to date on edits."""
+        self.duplicates = dict(duplicates)
+        for index, thumb in self.visible_cards.items():
+            thumb.set_duplicate_of(self._duplicate_of(index))
+
+    def _zoom_factor(self):
+        return self.zoom_level / 50.0 # 0.2 to 2.0
+
+    def _image_box(self, factor):
+        """Image area of a card at zoom `factor`."""
+        return (int(self.CARD_SIZE[0] * factor) - self.CARD_PADDING[0],
+                int(self.CARD_SIZE[1] * factor) - self.CARD_PADDING[1])
+
+    def _thumbnail_tier(self):
+        factor = self._zoom_factor()
+        for tier in self.THUMBNAIL_TIERS:
+            if tier >= factor:
+                return tier
+        return self.THUMBNAIL_TIERS[-1]
+
+    def thumbnail_scale(self, index, tier=1.0):
+        """Scale at which MuPDF renders the page straight to the card image area of `tier`."""
+        return self.main_window.pdf_manager.get_fit_scale(index, *self._image_box(tier))
+
+    def _cached_tier(self, index, above=0):
+        """(scale, thumbnail) of the highest tier above `above` held in memory, or (None, None)."""
+        pdf_manager = self.main_window.pdf_manager
+        for tier in reversed(self.THUMBNAIL_TIERS):
+            if tier <= above:
+                break
+            scale = self.thumbnail_scale(index, tier)
+            cached = pdf_manager.get_cached_thumbnail(index, scale)
+            if cached is not None:
+                return scale, cached
+        return None, None
+
+    def best_cached_thumbnail(self, index):
+        """Highest tier of the page's thumbnail held in memory, or None."""
+        return self._cached_tier(index)[1]
+
+    def _request_card_image(self, thumb, index, priority=ThumbnailRenderer.PRIORITY_VISIBLE):
+        pdf_manager = self.main_window.pdf_manager
+        tier = self._thumbnail_tier()
+        # Mid-zoom any tier in memory will do; a higher tier only needs downscaling.
+        # Either way nothing is rendered.
+        scale, cached = self._cached_tier(index, above=0 if self.zoom_timer.isActive() else tier)
+        if cached is not None:
+            self._bind_card_key(thumb, pdf_manager.get_thumbnail_key(index, scale))
+            self._update_thumbnail_data(thumb, cached)
+            return
+        if self.zoom_timer.isActive():
+            return # _render_visible_cards asks again once the zoom settles
+
+        # Bind the key first: cached thumbnails are delivered before request() returns
+        scale = self.thumbnail_scale(index, tier)
+        self._bind_card_key(thumb, pdf_manager.get_thumbnail_key(index, scale))
+        self.renderer.request(index, scale=scale, priority=priority)
+
+    def _bind_card_key(self, thumb, page_key):
+        if thumb.page_key is not None and thumb.page_key != page_key:
+            self.renderer.cancel(thumb.page_key) # e.g. the tier of the previous zoom
+        thumb.page_key = page_key
+
+    def _place_card(self, thumb, index):
+        rect = self.grid.card_rect(index)
+        thumb.setFixedSize(rect.size())
+        thumb.move(rect.topLeft())
+
+    def _release_card(self, index):
+        self._recycle_card(self.visible_cards.pop(index))
+
+    def _recycle_card(self, thumb):
+        self.renderer.cancel(thumb.page_key)
+        thumb.hide()
+        thumb.image_pixmap = None
+        thumb.page_key = None
+        self.card_pool.append(thumb)
+
+    def _release_all_cards(self):
+        for index in list(self.visible_cards):
+            self._release_card(index)
+
+    def _on_thumbnail_ready(self, cache_key, image):
+        for thumb in self.visible_cards.values():
+            if thumb.page_key == cache_key:
+                self._update_thumbnail_data(thumb, image)
 
     def _update_thumbnail_data(self, thumb, image_data):
         # Helper to update thumbnail content dynamically
         if image_data:
-            if isinstance(image_data, dict) and 'samples' in image_data:
-                image = QImage(
-                    image_data['samples'],
-                    image_data['width'],
-                    image_data['height'],
-                    image_data['stride'],
-                    QImage.Format.Format_RGB888
-                )
+            if isinstance(image_data, QImage):
+                image = image_data
+            elif isinstance(image_data, ImageBuffer):
+                image = image_from_buffer(image_data)
             else:
                 image = QImage.fromData(image_data)
 
-            # Scale based on widget size
-            w = thumb.width() - 20 # Padding
-            h = thumb.height() - 40 # Padding + Text
+            self._fit_card_pixmap(thumb, QPixmap.fromImage(image))
 
-            thumb.image_pixmap = QPixmap.fromImage(image).scaled(
+    def _fit_card_pixmap(self, thumb, pixmap):
+        # Scale based on widget size
+        w = thumb.width() - self.CARD_PADDING[0] # Padding
+        h = thumb.height() - self.CARD_PADDING[1] # Padding + Text
+
+        # MuPDF renders for the card size when the tier matches the zoom; otherwise rescale
+        fitted = pixmap.size().scaled(w, h, Qt.AspectRatioMode.KeepAspectRatio)
+        if abs(fitted.width() - pixmap.width()) > 1 or abs(fitted.height() - pixmap.height()) > 1:
+            pixmap = pixmap.scaled(
                 w, h,
                 Qt.AspectRatioMode.KeepAspectRatio,
                 Qt.TransformationMode.SmoothTransformation
             )
-            thumb.update()
+        thumb.image_pixmap = pixmap
+        thumb.update()
 
     def _render_docs_view(self, layout):
         files = self.main_window.pdf_manager.get_files_in_order()
@@ -691,8 +951,8 @@ class CenterCanvas(QWidget):
         self.request_viewer.emit(index)
 
     def update_visual_selection(self):
-        for thumb in self.thumbnails:
-            thumb.set_selected(thumb.index in self.selected_indices)
+        for index, thumb in self.visible_cards.items():
+            thumb.set_selected(index in self.selected_indices)
 
     def on_lasso_started(self):
         modifiers = QApplication.keyboardModifiers()
@@ -713,12 +973,7 @@ class CenterCanvas(QWidget):
 
     def update_lasso_selection(self, rect):
         modifiers = QApplication.keyboardModifiers()
-        in_rect_indices = set()
-
-        for thumb in self.thumbnails:
-            thumb_rect = thumb.geometry()
-            if rect.intersects(thumb_rect):
-                in_rect_indices.add(thumb.index)
+        in_rect_indices = self.grid.indices_in_rect(rect)
 
         if modifiers & (Qt.KeyboardModifier.ControlModifier | Qt.KeyboardModifier.ShiftModifier):
             if not hasattr(self, 'selection_snapshot'):
@@ -0,0 +1,128 @@
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from ..core.jobs import CancelToken, JobCancelled
+
+class Job(QObject):
+    """
+    One background operation. Signals are emitted from the pool thread and
+    delivered on the GUI thread; exactly one of finished/error/cancelled fires.
+    """
+    started = pyqtSignal()
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, func, args, kwargs, with_progress=False, cancellable=False):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.with_progress = with_progress
+        self.cancellable = cancellable
+        self.token = CancelToken()
+        self.runnable = None
+        self.pool = None
+
+    def cancel(self):
+        self.token.cancel()
+
+    def run(self):
+        if self.token.is_set():
+            self.cancelled.emit()
+            return
+        self.started.emit()
+
+        kwargs = dict(self.kwargs)
+        if self.with_progress:
+            kwargs['progress_callback'] = self.progress.emit
+        if self.cancellable:
+            kwargs['cancel_token'] = self.token
+        try:
+            result = self.func(*self.args, **kwargs)
+        except JobCancelled:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            self.error.emit(str(e))
+            return
+        self.finished.emit(result)
+
+class _JobRunnable(QRunnable):
+    def __init__(self, job):
+        super().__init__()
+        self.setAutoDelete(False) # Kept by the job to allow tryTake()
+        self.job = job
+
+    def run(self):
+        self.job.run()
+
+class JobManager(QObject):
+    """
+    Runs background jobs on a thread pool with at most `max_concurrent` at a
+    time; the rest wait in the pool's queue. Short interactive jobs (loading,
+    rotating) have their own single-thread lane, so they run one after another
+    and never wait behind a long export or OCR run. Jobs can be cancelled while
+    queued or, if the operation polls its token, while running.
+    """
+    DEFAULT_MAX_CONCURRENT = 2
+
+    job_added = pyqtSignal(object)
+    job_done = pyqtSignal(object)
+
+    def __init__(self, max_concurrent=DEFAULT_MAX_CONCURRENT, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_concurrent)
+        self.interactive_pool = QThreadPool(self)
+        self.interactive_pool.setMaxThreadCount(1)
+        self.jobs = [] # Queued or running, in submission order
+
+    def set_max_concurrent(self, max_concurrent):
+        self.pool.setMaxThreadCount(max_concurrent)
+
+    def create(self, func, *args, with_progress=False, cancellable=False, background=True, **kwargs):
+        """
+        Registers `func(*args, **kwargs)` as a job without starting it, so the
+        caller can connect its signals first; a fast job could otherwise finish
+        before anyone listens. With `with_progress` it also gets a
+        `progress_callback(current, total)`, with `cancellable` a `cancel_token`.
+        `background=False` puts it on the interactive lane.
+        """
+        job = Job(func, args, kwargs, with_progress, cancellable)
+        job.runnable = _JobRunnable(job)
+        job.pool = self.pool if background else self.interactive_pool
+        for signal in (job.finished, job.error, job.cancelled):
+            signal.connect(lambda *_, job=job: self._on_job_done(job))
+        self.jobs.append(job)
+        self.job_added.emit(job)
+        return job
+
+    def start(self, job):
+        job.pool.start(job.runnable)
+
+    def submit(self, func, *args, **kwargs):
+        """Creates and starts a job; see create()."""
+        job = self.create(func, *args, **kwargs)
+        self.start(job)
+        return job
+
+    def cancel(self, job):
+        job.cancel()
+        # Still queued: drop it without waiting for a thread
+        if job.pool.tryTake(job.runnable):
+            job.cancelled.emit()
+
+    def cancel_all(self):
+        for job in list(self.jobs):
+            self.cancel(job)
+
+    def has_active_jobs(self):
+        return bool(self.jobs)
+
+    def wait_for_done(self, msecs=-1):
+        return self.pool.waitForDone(msecs) and self.interactive_pool.waitForDone(msecs)
+
+    def _on_job_done(self, job):
+        if job in self.jobs:
+            self.jobs.remove(job)
+            self.job_done.emit(job)
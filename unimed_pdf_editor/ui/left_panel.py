@@ -59,6 +59,9 @@ class LeftPanel(QFrame):
         self.btn_merge = self.create_button("Unificar", "Salvar tudo em um PDF", "merge", icon_char="📑")
         layout_actions.addWidget(self.btn_merge)
 
+        self.btn_merge_dedup = self.create_button("Unificar sem Repetições", "Salvar tudo em um PDF, gravando uma única vez imagens e fontes repetidas (logotipos, timbres)", "merge", "dedup", icon_char="📑")
+        layout_actions.addWidget(self.btn_merge_dedup)
+
         self.btn_split = self.create_button("Separar", "Salvar páginas selecionadas", "split", icon_char="✂️")
         layout_actions.addWidget(self.btn_split)
 
@@ -80,6 +83,9 @@ class LeftPanel(QFrame):
         self.btn_ocr = self.create_button("OCR (Texto)", "Reconhecimento de Texto", "ocr", icon_char="🔍")
         layout_tools.addWidget(self.btn_ocr)
 
+        self.btn_duplicates = self.create_button("Páginas Duplicadas", "Marca e seleciona páginas com conteúdo idêntico a outra", "find_duplicates", icon_char="👥")
+        layout_tools.addWidget(self.btn_duplicates)
+
         # Compression Sub-Layout
         lbl_compress = QLabel("Compactação:")
         lbl_compress.setStyleSheet("color: #CCCCCC; font-size: 12px; margin-top: 5px;")
@@ -97,6 +103,10 @@ class LeftPanel(QFrame):
         self.btn_compress_high.setStyleSheet("font-size: 13px;")
         row_layout.addWidget(self.btn_compress_high)
 
+        self.btn_compress_target = self.create_button("Tamanho Máximo", "Ajusta as imagens para caber em um tamanho de arquivo", "compress", "target", icon_char="📉")
+        self.btn_compress_target.setStyleSheet("font-size: 13px;")
+        row_layout.addWidget(self.btn_compress_target)
+
         layout_tools.addWidget(row_compress)
 
         layout.addWidget(group_tools)
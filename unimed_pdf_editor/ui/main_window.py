@@ -1,12 +1,14 @@
 
 from PyQt6.QtWidgets import QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, QFrame, QSplitter, QFileDialog, QMessageBox, QProgressDialog, QApplication, QLabel, QInputDialog
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QObject
+from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QPixmap, QIcon, QKeySequence, QShortcut
 from .styles import STYLESHEET, COLOR_PRIMARY
 from .left_panel import LeftPanel
 from .center_canvas import CenterCanvas
 from .right_viewer import RightViewer
+from .job_manager import JobManager
 from ..core.pdf_manager import PDFManager
+from ..core.disk_cache import DiskThumbnailCache, OCRCheckpointStore
 import os
 
 class Header(QFrame):
@@ -33,11 +35,20 @@ class Header(QFrame):
         layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
 
 class LoadingDialog(QProgressDialog):
-    def __init__(self, message, parent=None):
+    def __init__(self, message, parent=None, on_cancel=None, modal=True):
         super().__init__(parent)
-        self.setModal(True)
+        # Non-modal dialogs belong to background jobs: the window stays usable
+        self.setModal(modal)
         self.setWindowFlags(Qt.WindowType.Dialog | Qt.WindowType.FramelessWindowHint)
-        self.setCancelButton(None)
+        if on_cancel:
+            self.setCancelButtonText("Cancelar")
+            self.canceled.connect(on_cancel)
+            self.canceled.connect(self._show_cancelling)
+        else:
+            self.setCancelButton(None)
+        # Closed by the window when the job ends, the task may still be finishing
+        self.setAutoClose(False)
+        self.setAutoReset(False)
         self.setMinimumDuration(0)
         self.setRange(0, 0) # Indeterminate
 
@@ -65,36 +76,17 @@ class LoadingDialog(QProgressDialog):
         """)
 
     def set_progress(self, current, total):
-        if self.maximum() == 0 and total > 0:
+        if total > 0 and self.maximum() != total:
             self.setRange(0, total)
         base_text = self.labelText().split('(')[0].strip()
         self.setLabelText(f"{base_text} ({current}/{total})")
         self.setValue(current)
 
     def update_progress(self, current, total):
-        QApplication.processEvents()
         self.set_progress(current, total)
 
-class Worker(QObject):
-    finished = pyqtSignal(object)
-    error = pyqtSignal(str)
-    progress = pyqtSignal(int, int)
-
-    def __init__(self, func, *args, **kwargs):
-        super().__init__()
-        self.func = func
-        self.args = args
-        self.kwargs = kwargs
-
-    def run(self):
-        try:
-            if 'progress_callback' in self.kwargs:
-                 result = self.func(*self.args, progress_callback=self.kwargs['progress_callback'])
-            else:
-                 result = self.func(*self.args, **self.kwargs)
-            self.finished.emit(result)
-        except Exception as e:
-            self.error.emit(str(e))
+    def _show_cancelling(self):
+        self.setLabelText("Cancelando...")
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -102,10 +94,29 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("UNIMED - Editor de PDF")
         self.resize(1200, 800)
         self.setStyleSheet(STYLESHEET)
-        self.pdf_manager = PDFManager()
+        self.pdf_manager = PDFManager(disk_cache=self._create_disk_cache())
+        self.jobs = JobManager(parent=self)
+        self.loading_dialogs = []
+        self.compress_target_mb = 10.0 # Last size asked for in "Tamanho Máximo"
+        self.compress_dpi = 150 # Image resolution kept by "Alta (Imagens)"
         self.init_ui()
         self.setup_shortcuts()
 
+    def _create_disk_cache(self):
+        # The persistent thumbnail cache is an optimization; run without it if the dir is unusable
+        try:
+            return DiskThumbnailCache()
+        except OSError as e:
+            print(f"Thumbnail disk cache disabled: {e}")
+            return None
+
+    def _create_ocr_checkpoints(self):
+        try:
+            return OCRCheckpointStore()
+        except OSError as e:
+            print(f"OCR checkpoints disabled: {e}")
+            return None
+
     def create_pane_with_title(self, title_text, widget):
         container = QWidget()
         layout = QVBoxLayout(container)
@@ -181,23 +192,21 @@ class MainWindow(QMainWindow):
         self.shortcut_redo.activated.connect(self.do_redo)
 
     def do_undo(self):
+        # The canvas follows PDFManager's change notifications
         if self.pdf_manager.undo():
-            self.center_canvas.refresh_thumbnails()
             # Also update viewer if current page affected?
-            # Ideally yes, but refreshing thumbnails is key.
-            # And clear selection to avoid index errors
+            # Clear selection to avoid index errors
             self.center_canvas.clear_selection()
 
     def do_redo(self):
         if self.pdf_manager.redo():
-            self.center_canvas.refresh_thumbnails()
             self.center_canvas.clear_selection()
 
     def handle_action(self, action_name, data=None):
         if action_name == "load_pdf":
             self.load_pdf(data)
         elif action_name == "merge":
-            self.merge_pdfs()
+            self.merge_pdfs(deduplicate=data == "dedup")
         elif action_name == "split":
             self.split_pdf()
         elif action_name == "compress":
@@ -206,6 +215,8 @@ class MainWindow(QMainWindow):
             self.delete_selected_pages()
         elif action_name == "ocr":
             self.run_ocr()
+        elif action_name == "find_duplicates":
+            self.find_duplicate_pages()
         elif action_name == "select_pages":
             self.select_pages_from_input(data)
         elif action_name == "clear_session":
@@ -220,15 +231,17 @@ class MainWindow(QMainWindow):
         if not filepaths:
             return
 
-        self.show_loading(f"Carregando {len(filepaths)} arquivo(s)...")
+        def task(progress_callback):
+            return self.pdf_manager.load_pdf(filepaths, progress_callback=progress_callback)
 
-        def task():
-            self.pdf_manager.load_pdf(filepaths)
-
-        def success(_):
-            self.center_canvas.refresh_thumbnails()
+        def success(result):
+            if result.failed:
+                details = "\n".join(f"• {os.path.basename(path)}: {reason}" for path, reason in result.failed)
+                QMessageBox.warning(self, "Atenção",
+                                    f"{len(result.failed)} de {len(filepaths)} arquivo(s) não puderam ser carregados:\n\n{details}")
 
-        self.execute_task(task, success_callback=success)
+        self.execute_task(task, message=f"Carregando {len(filepaths)} arquivo(s)...",
+                          success_callback=success, with_progress=True)
 
     def handle_page_selection(self, selected_indices):
         self.left_panel.update_selection_input(selected_indices)
@@ -252,13 +265,11 @@ class MainWindow(QMainWindow):
     def rotate_single_page_from_viewer(self):
         idx = self.right_viewer.current_page_index
         if idx is not None:
-             self.show_loading("Rotacionando página...")
              def task():
                  self.pdf_manager.rotate_page(idx, 90)
              def success(_):
                  self.right_viewer.load_page(idx)
-                 self.center_canvas.refresh_thumbnails()
-             self.execute_task(task, success_callback=success)
+             self.execute_task(task, message="Rotacionando página...", success_callback=success)
 
     def delete_single_page_from_viewer(self):
         idx = self.right_viewer.current_page_index
@@ -268,7 +279,6 @@ class MainWindow(QMainWindow):
                                          QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
              if confirm == QMessageBox.StandardButton.Yes:
                 self.pdf_manager.delete_pages([idx])
-                self.center_canvas.refresh_thumbnails()
                 new_total = self.pdf_manager.get_page_count()
                 if new_total > 0:
                     new_idx = min(idx, new_total - 1)
@@ -288,80 +298,86 @@ class MainWindow(QMainWindow):
 
         output_path, selected_filter = QFileDialog.getSaveFileName(self, "Baixar Página", f"pagina_{idx+1}{default_ext}", filters, default_filter)
         if output_path:
-            self.show_loading("Exportando página...")
-
             def task():
                 if selected_filter.endswith('.png)') or selected_filter.endswith('.jpg)'):
-                    # For export, we need to respect rotation
-                    # get_page_image handles rotation now?
-                    # No, get_page_image calls get_pixmap with rotation logic in PDFManager
-                    pix_bytes = self.pdf_manager.get_page_image(idx, scale=2.0) # ppm
-                    # Need to save bytes.
-                    # Or better: use fitz in task
-                    original_idx, _, _, rot = self.pdf_manager.page_order[idx]
-                    page = self.pdf_manager.doc.load_page(original_idx)
-                    page.set_rotation(rot)
-                    pix = page.get_pixmap(dpi=300)
+                    # For export, we need to respect rotation: get_page applies it
+                    pix = self.pdf_manager.get_page(idx).get_pixmap(dpi=300)
                     pix.save(output_path)
                 else:
-                    new_doc = self.pdf_manager.fitz.open()
-                    original_idx, _, _, rot = self.pdf_manager.page_order[idx]
-                    new_doc.insert_pdf(self.pdf_manager.doc, from_page=original_idx, to_page=original_idx, rotate=rot)
-                    new_doc.save(output_path)
-                    new_doc.close()
+                    self.pdf_manager.split_pdf([idx], output_path)
 
             def success(_):
                  QMessageBox.information(self, "Sucesso", "Página exportada com sucesso!")
 
-            self.execute_task(task, success_callback=success)
-
-    def show_loading(self, message="Processando..."):
-        self.loading_dialog = LoadingDialog(message, self)
-        self.loading_dialog.show()
-        QApplication.processEvents()
-
-    def hide_loading(self):
-        if hasattr(self, 'loading_dialog') and self.loading_dialog:
-            self.loading_dialog.close()
-            self.loading_dialog = None
+            self.execute_task(task, message="Exportando página...", success_callback=success)
+
+    def _show_loading_dialog(self, dialog):
+        self.loading_dialogs.append(dialog)
+        self._place_loading_dialogs()
+        dialog.show()
+
+    def _close_loading_dialog(self, dialog):
+        if dialog in self.loading_dialogs:
+            self.loading_dialogs.remove(dialog)
+            dialog.close()
+            self._place_loading_dialogs()
+
+    def _place_loading_dialogs(self):
+        # Background jobs stack up in the bottom-right corner, above each other
+        bottom = self.geometry().bottom() - 20
+        for dialog in self.loading_dialogs:
+            if dialog.isModal():
+                continue
+            dialog.adjustSize()
+            dialog.move(self.geometry().right() - dialog.width() - 20, bottom - dialog.height())
+            bottom -= dialog.height() + 10
 
     def clear_session(self):
+        if self.jobs.has_active_jobs():
+            QMessageBox.warning(self, "Atenção", "Aguarde o término das tarefas em andamento (ou cancele-as) antes de limpar a sessão.")
+            return
         confirm = QMessageBox.question(self, "Confirmar",
                                        "Tem certeza que deseja limpar a sessão?",
                                        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if confirm == QMessageBox.StandardButton.Yes:
             self.pdf_manager.clear_session()
-            self.center_canvas.refresh_thumbnails()
             self.right_viewer.clear()
             self.center_canvas.clear_selection()
 
-    def execute_task(self, func, *args, success_callback=None, with_progress=False, **kwargs):
-        self.thread = QThread()
-        kwargs_with_progress = kwargs.copy()
-        worker = Worker(func, *args, **kwargs_with_progress)
+    def execute_task(self, func, *args, message="Processando...", success_callback=None,
+                     with_progress=False, cancellable=False, modal=True, **kwargs):
+        """
+        Runs `func` on the job manager behind a LoadingDialog. Modal jobs are
+        quick operations that change the page list and run on the interactive
+        lane; long exports run with modal=False as background jobs so the window
+        stays usable, and with cancellable=True get a cancel button that sets the
+        job's cancel token.
+        """
+        job = self.jobs.create(func, *args, with_progress=with_progress, cancellable=cancellable,
+                               background=not modal, **kwargs)
+        dialog = LoadingDialog(message, self, on_cancel=(lambda: self.jobs.cancel(job)) if cancellable else None, modal=modal)
 
         if with_progress:
-             worker.kwargs['progress_callback'] = worker.progress.emit
-
-        self.worker = worker
-        self.worker.moveToThread(self.thread)
+            job.progress.connect(dialog.update_progress)
+        job.finished.connect(lambda _: self._close_loading_dialog(dialog))
+        job.error.connect(lambda _: self._close_loading_dialog(dialog))
+        job.cancelled.connect(lambda: self._close_loading_dialog(dialog))
 
-        self.thread.started.connect(self.worker.run)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-
-        self.worker.finished.connect(self.hide_loading)
         if success_callback:
-            self.worker.finished.connect(success_callback)
-
-        self.worker.error.connect(lambda err: QMessageBox.critical(self, "Erro", f"Ocorreu um erro: {err}"))
-        self.worker.error.connect(self.hide_loading)
+            job.finished.connect(success_callback)
+        job.error.connect(lambda err: QMessageBox.critical(self, "Erro", f"Ocorreu um erro: {err}"))
 
-        if with_progress:
-            self.worker.progress.connect(self.loading_dialog.update_progress)
+        self._show_loading_dialog(dialog)
+        # Only now: every slot is connected before the job can emit
+        self.jobs.start(job)
+        return job
 
-        self.thread.start()
+    def closeEvent(self, event):
+        # Stop background jobs after their current page; the pool threads must
+        # not outlive the window
+        self.jobs.cancel_all()
+        self.jobs.wait_for_done()
+        super().closeEvent(event)
 
     def rotate_selected_pages(self):
         indices = self.center_canvas.get_selected_indices()
@@ -369,21 +385,38 @@ class MainWindow(QMainWindow):
              QMessageBox.warning(self, "Atenção", "Selecione as páginas para rotacionar.")
              return
 
-        self.show_loading("Rotacionando páginas...")
-
         def task():
-            for idx in indices:
-                self.pdf_manager.rotate_page(idx, 90)
+            self.pdf_manager.rotate_pages(indices, 90)
 
-        self.execute_task(task, success_callback=lambda _: self.center_canvas.refresh_thumbnails())
+        self.execute_task(task, message="Rotacionando páginas...")
 
-    def merge_pdfs(self):
+    def merge_pdfs(self, deduplicate=False):
         output_path, _ = QFileDialog.getSaveFileName(self, "Salvar PDF Unificado", "unificado.pdf", "PDF Files (*.pdf)")
         if output_path:
-            self.show_loading("Unificando PDF...")
             def success(_):
                 QMessageBox.information(self, "Sucesso", "PDF unificado salvo com sucesso!")
-            self.execute_task(self.pdf_manager.save_pdf, output_path, success_callback=success)
+            self.execute_task(self.pdf_manager.save_pdf, output_path, message="Unificando PDF...",
+                              success_callback=success, with_progress=True, cancellable=True, modal=False,
+                              deduplicate=deduplicate)
+
+    def find_duplicate_pages(self):
+        if not self.pdf_manager.get_page_count():
+            return
+
+        def success(_):
+            # Recomputed here: pages may have been edited while hashing
+            duplicates = self.pdf_manager.find_duplicate_pages()
+            self.center_canvas.set_duplicates(duplicates)
+            if duplicates:
+                self.center_canvas.set_selection(sorted(duplicates))
+                self.handle_page_selection(sorted(duplicates))
+                QMessageBox.information(self, "Páginas Duplicadas",
+                                        f"{len(duplicates)} página(s) duplicada(s) encontrada(s) e selecionada(s).\n"
+                                        "Use \"Excluir\" para removê-las.")
+            else:
+                QMessageBox.information(self, "Páginas Duplicadas", "Nenhuma página duplicada encontrada.")
+        self.execute_task(self.pdf_manager.hash_pages, message="Procurando páginas duplicadas...",
+                          success_callback=success, with_progress=True, cancellable=True, modal=False)
 
     def split_pdf(self):
         indices = self.center_canvas.get_selected_indices()
@@ -393,18 +426,36 @@ class MainWindow(QMainWindow):
 
         output_path, _ = QFileDialog.getSaveFileName(self, "Salvar PDF Separado", "separado.pdf", "PDF Files (*.pdf)")
         if output_path:
-            self.show_loading("Separando PDF...")
             def success(_):
                 QMessageBox.information(self, "Sucesso", "PDF separado salvo com sucesso!")
-            self.execute_task(self.pdf_manager.split_pdf, indices, output_path, success_callback=success)
+            self.execute_task(self.pdf_manager.split_pdf, indices, output_path, message="Separando PDF...",
+                              success_callback=success, with_progress=True, cancellable=True, modal=False)
 
     def compress_pdf(self, level):
+        target_size = None
+        if level == "target":
+            target_mb, ok = QInputDialog.getDouble(self, "Tamanho Máximo", "Tamanho máximo do arquivo (MB):",
+                                                   self.compress_target_mb, 0.1, 10000.0, 1)
+            if not ok:
+                return
+            self.compress_target_mb = target_mb
+            target_size = int(target_mb * 1024 * 1024)
+
         output_path, _ = QFileDialog.getSaveFileName(self, "Salvar PDF Compactado", "compactado.pdf", "PDF Files (*.pdf)")
         if output_path:
-            self.show_loading(f"Compactando PDF (Nível: {level})...")
-            def success(_):
-                QMessageBox.information(self, "Sucesso", f"PDF compactado ({level}) salvo com sucesso!")
-            self.execute_task(self.pdf_manager.compress_pdf, output_path, level, success_callback=success)
+            def success(result):
+                if target_size is None:
+                    QMessageBox.information(self, "Sucesso", f"PDF compactado ({level}) salvo com sucesso!")
+                elif result.reached:
+                    QMessageBox.information(self, "Sucesso", f"PDF compactado salvo com sucesso ({result.size / (1024 * 1024):.1f} MB).")
+                else:
+                    QMessageBox.warning(self, "Atenção",
+                                        f"Não foi possível chegar a {target_mb:.1f} MB. "
+                                        f"O PDF foi salvo com {result.size / (1024 * 1024):.1f} MB, na menor qualidade de imagem.")
+            message = "Compactando PDF (Tamanho máximo)..." if target_size else f"Compactando PDF (Nível: {level})..."
+            self.execute_task(self.pdf_manager.compress_pdf, output_path, level, message=message,
+                              success_callback=success, with_progress=True, cancellable=True, modal=False,
+                              target_size=target_size, target_dpi=self.compress_dpi)
 
     def delete_selected_pages(self):
         indices = self.center_canvas.get_selected_indices()
@@ -414,7 +465,6 @@ class MainWindow(QMainWindow):
                                          QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
             if confirm == QMessageBox.StandardButton.Yes:
                 self.pdf_manager.delete_pages(indices)
-                self.center_canvas.refresh_thumbnails()
                 self.center_canvas.clear_selection()
 
     def run_ocr(self):
@@ -423,40 +473,30 @@ class MainWindow(QMainWindow):
 
         from ..core.ocr_engine import OCREngine
         import tempfile
-        ocr = OCREngine()
+        import shutil
+        checkpoints = self._create_ocr_checkpoints()
+        ocr = OCREngine(checkpoints=checkpoints)
 
         output_path, _ = QFileDialog.getSaveFileName(self, "Salvar PDF Pesquisável", "ocr.pdf", "PDF Files (*.pdf)")
         if output_path:
-            self.show_loading("Executando OCR...")
-            fd, temp_path = tempfile.mkstemp(suffix=".pdf")
-            os.close(fd)
-
-            try:
-                self.pdf_manager.save_pdf(temp_path)
-            except Exception as e:
-                self.hide_loading()
-                QMessageBox.critical(self, "Erro", f"Falha ao preparar arquivo para OCR: {e}")
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                return
+            # The exported input lives in a job dir that is removed when the task ends;
+            # pages already OCRed are kept in the checkpoint store for a rerun
+            job_dir = checkpoints.create_job_dir() if checkpoints else tempfile.mkdtemp()
+            temp_path = os.path.join(job_dir, "input.pdf")
 
-            def task(progress_callback):
+            def task(progress_callback, cancel_token):
                 try:
-                    return ocr.make_searchable(temp_path, output_path, progress_callback)
+                    self.pdf_manager.save_pdf(temp_path, progress_callback, cancel_token)
+                    return ocr.make_searchable(temp_path, output_path, progress_callback, cancel_token)
                 finally:
-                    pass
+                    shutil.rmtree(job_dir, ignore_errors=True)
 
             def success(result):
-                if os.path.exists(temp_path):
-                    try:
-                        os.remove(temp_path)
-                    except:
-                        pass
-
                 success_flag, msg = result
                 if success_flag:
-                     QMessageBox.information(self, "Sucesso", msg)
+                     QMessageBox.information(self, "Sucesso", f"{msg}\n\nTempo total: {ocr.timings.get('total', 0):.1f} s")
                 else:
                      QMessageBox.critical(self, "Erro", f"Falha no OCR: {msg}")
 
-            self.execute_task(task, success_callback=success, with_progress=True)
+            self.execute_task(task, message="Executando OCR...", success_callback=success,
+                              with_progress=True, cancellable=True, modal=False)
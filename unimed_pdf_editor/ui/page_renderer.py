@@ -0,0 +1,132 @@
+import math
+import fitz  # PyMuPDF
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QThread, QRect, QSize, pyqtSignal
+from ..core.cache import LRUCache
+from ..core.image_buffer import ImageBuffer
+from .thumbnail_renderer import _thread_document, close_thread_documents, image_from_buffer
+
+class _TileJob(QRunnable):
+    def __init__(self, renderer, key, source, zoom, rect):
+        super().__init__()
+        self.setAutoDelete(False) # We keep a reference to allow tryTake()
+        self.renderer = renderer
+        self.key = key
+        self.source = source
+        self.zoom = zoom
+        self.rect = rect
+
+    def run(self):
+        filepath, page_number, rotation = self.source
+        try:
+            page = _thread_document(filepath).load_page(page_number)
+            page.set_rotation(rotation)
+            # The clip is in (rotated) page units; only that region is rasterized
+            x, y, w, h = self.rect.x(), self.rect.y(), self.rect.width(), self.rect.height()
+            clip = fitz.Rect(x, y, x + w, y + h) / self.zoom
+            pix = page.get_pixmap(matrix=fitz.Matrix(self.zoom, self.zoom), clip=clip, alpha=False)
+            image = image_from_buffer(ImageBuffer.from_pixmap(pix))
+        except Exception as e:
+            print(f"Error rendering tile {self.key}: {e}")
+            image = None
+
+        try:
+            self.renderer._tile_finished.emit(self, image)
+        except RuntimeError:
+            pass # Renderer destroyed while we were running (application shutting down)
+
+class PageTileRenderer(QObject):
+    """
+    Rasterizes pages for the viewer in TILE_SIZE squares on a thread pool, only
+    for the regions asked for (what is on screen, plus the neighbouring pages
+    as prefetch). Tiles are cached per page and zoom, keyed like thumbnails, so
+    they stay valid while pages move around and go stale on rotation. A tile
+    is cheaper than a page, but a heavy page still holds the GIL while it
+    renders (see ThumbnailRenderer).
+    """
+    TILE_SIZE = 512
+    CACHE_BYTES = 128 * 1024 * 1024
+    PRIORITY_VISIBLE = 1
+    PRIORITY_PREFETCH = 0
+
+    tile_ready = pyqtSignal(object) # tile key
+    _tile_finished = pyqtSignal(object, object) # job, image
+
+    def __init__(self, pdf_manager, max_threads=None, parent=None):
+        super().__init__(parent)
+        self.pdf_manager = pdf_manager
+        self.tiles = LRUCache(self.CACHE_BYTES, sizeof=lambda image: image.sizeInBytes())
+        self.pending = {} # tile key -> _TileJob
+
+        self.pool = QThreadPool(self)
+        if max_threads is None:
+            # Leave one core for the GUI thread
+            max_threads = max(1, min(2, QThread.idealThreadCount() - 1))
+        self.pool.setMaxThreadCount(max_threads)
+        self.pool.setExpiryTimeout(-1) # Idle threads keep their document handles
+
+        self._tile_finished.connect(self._on_tile_finished)
+
+    def page_key(self, page_index, zoom):
+        return self.pdf_manager.get_thumbnail_key(page_index, zoom)
+
+    def page_size(self, page_index, zoom):
+        """Pixel size of the whole page at `zoom`."""
+        rect = self.pdf_manager.get_page(page_index).rect
+        return QSize(math.ceil(rect.width * zoom), math.ceil(rect.height * zoom))
+
+    def tiles_in(self, page_key, page_size, rect):
+        """(tile key, tile rect) for every tile of the page intersecting `rect`."""
+        rect = rect.intersected(QRect(0, 0, page_size.width(), page_size.height()))
+        if rect.isEmpty():
+            return []
+        size = self.TILE_SIZE
+        tiles = []
+        for row in range(rect.top() // size, rect.bottom() // size + 1):
+            for col in range(rect.left() // size, rect.right() // size + 1):
+                tile_rect = QRect(col * size, row * size,
+                                  min(size, page_size.width() - col * size),
+                                  min(size, page_size.height() - row * size))
+                tiles.append((page_key + (col, row), tile_rect))
+        return tiles
+
+    def get(self, tile_key):
+        return self.tiles.get(tile_key)
+
+    def request(self, page_index, zoom, page_size, rect, priority=PRIORITY_VISIBLE):
+        """
+        Queues the missing tiles of `page_index` that intersect `rect` (page
+        pixels at `zoom`). Returns the keys of all tiles in the region.
+        """
+        page_key = self.page_key(page_index, zoom)
+        tiles = self.tiles_in(page_key, page_size, rect)
+        source = None
+        for tile_key, tile_rect in tiles:
+            if tile_key in self.tiles or tile_key in self.pending:
+                continue
+            if source is None:
+                source = self.pdf_manager.get_render_source(page_index)
+            job = _TileJob(self, tile_key, source, zoom, tile_rect)
+            self.pending[tile_key] = job
+            self.pool.start(job, priority)
+        return [tile_key for tile_key, _ in tiles]
+
+    def cancel_except(self, keep):
+        """Drops queued tiles not in `keep`, e.g. after scrolling or changing page."""
+        keep = set(keep)
+        for tile_key, job in list(self.pending.items()):
+            if tile_key not in keep and self.pool.tryTake(job):
+                del self.pending[tile_key]
+
+    def clear(self):
+        self.pool.clear()
+        self.pending = {}
+        self.tiles.clear()
+        close_thread_documents()
+
+    def _on_tile_finished(self, job, image):
+        if self.pending.get(job.key) is job:
+            del self.pending[job.key]
+        if image is None or image.isNull():
+            return
+        self.tiles.put(job.key, image)
+        self.tile_ready.emit(job.key)
@@ -1,8 +1,70 @@
 
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QScrollArea, QPushButton, QHBoxLayout, QFrame
-from PyQt6.QtGui import QPixmap, QImage
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtGui import QPainter, QRegion
+from PyQt6.QtCore import Qt, pyqtSignal, QPoint, QRect, QRectF, QSize, QTimer
 from .styles import COLOR_PRIMARY, COLOR_TEXT
+from .page_renderer import PageTileRenderer
+from .thumbnail_renderer import image_from_buffer
+
+class PageView(QWidget):
+    """
+    The page at full zoomed size, painted from the tile cache. Where a tile is
+    still being rendered, the tiles of the previous zoom and then the page
+    thumbnail are stretched over its area so the page never shows up blank.
+    """
+    def __init__(self, renderer):
+        super().__init__()
+        self.renderer = renderer
+        self.page_key = None
+        self.page_size = QSize()
+        self.preview = None # QImage of the whole page, usually the cached thumbnail
+        self.previous = None # (page key, page size) of the zoom we came from
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+
+    def show_page(self, page_key, page_size, preview=None, previous=None):
+        self.page_key = page_key
+        self.page_size = page_size
+        self.preview = preview
+        self.previous = previous
+        self.setFixedSize(page_size)
+        self.update()
+
+    def update_tile(self, tile_key):
+        if tile_key[:-2] == self.page_key:
+            col, row = tile_key[-2:]
+            size = PageTileRenderer.TILE_SIZE
+            self.update(QRect(col * size, row * size, size, size))
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), Qt.GlobalColor.white)
+        if self.page_key is None:
+            return
+        missing = QRegion()
+        for tile_key, tile_rect in self.renderer.tiles_in(self.page_key, self.page_size, event.rect()):
+            image = self.renderer.get(tile_key)
+            if image is None:
+                missing += tile_rect
+            else:
+                painter.drawImage(tile_rect, image)
+        if missing.isEmpty():
+            return
+
+        painter.setClipRegion(missing.intersected(event.region()))
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        if self.preview is not None:
+            painter.drawImage(self.rect(), self.preview)
+        if self.previous is not None:
+            old_key, old_size = self.previous
+            sx = old_size.width() / self.page_size.width()
+            sy = old_size.height() / self.page_size.height()
+            bounds = QRectF(missing.boundingRect())
+            old_rect = QRectF(bounds.x() * sx, bounds.y() * sy, bounds.width() * sx, bounds.height() * sy).toAlignedRect()
+            for tile_key, tile_rect in self.renderer.tiles_in(old_key, old_size, old_rect):
+                image = self.renderer.tiles.peek(tile_key) # Stand-ins should not keep old tiles alive
+                if image is not None:
+                    painter.drawImage(QRectF(tile_rect.x() / sx, tile_rect.y() / sy,
+                                             tile_rect.width() / sx, tile_rect.height() / sy), image)
 
 class RightViewer(QWidget):
     action_triggered = pyqtSignal(str, object)
@@ -14,6 +76,14 @@ class RightViewer(QWidget):
         self.current_page_index = None
         self.zoom_level = 1.0  # Initial zoom level (scale)
         self.default_scale = 1.0
+        self.neighbours = [] # (index, page size) of the pages prefetched around the current one
+
+        # Zoom steps rescale what is on screen at once; tiles for the new zoom
+        # are only requested once the user stops clicking
+        self.zoom_timer = QTimer(self)
+        self.zoom_timer.setSingleShot(True)
+        self.zoom_timer.setInterval(250)
+        self.zoom_timer.timeout.connect(self._request_tiles)
         self.setObjectName("RightViewer") # Used for white background in styles.py
         self.init_ui()
 
@@ -36,6 +106,14 @@ class RightViewer(QWidget):
         self.image_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.scroll_area.setWidget(self.image_label)
 
+        # Page area, rendered in tiles in the background for what is on screen
+        self.renderer = PageTileRenderer(self.main_window.pdf_manager, parent=self)
+        self.renderer.tile_ready.connect(self._on_tile_ready)
+        self.page_view = PageView(self.renderer)
+        for scroll_bar in (self.scroll_area.horizontalScrollBar(), self.scroll_area.verticalScrollBar()):
+            scroll_bar.valueChanged.connect(self._request_tiles)
+            scroll_bar.rangeChanged.connect(self._request_tiles)
+
         main_layout.addWidget(self.scroll_area)
 
         # 2. Footer Actions (Rodapé)
@@ -133,34 +211,36 @@ class RightViewer(QWidget):
 
     def load_page(self, index):
         self.current_page_index = index
+        pdf_manager = self.main_window.pdf_manager
+        self.zoom_timer.stop()
         try:
-            # High res image for viewer (usando a função otimizada e zoom dinâmico)
-            img_data = self.main_window.pdf_manager.get_page_image(index, scale=self.zoom_level)
-            image = QImage.fromData(img_data)
-            pixmap = QPixmap.fromImage(image)
-
-            # Escala dinâmica
-            # Se a imagem for maior que a área visível, o QScrollArea cuida do scroll.
-            # Não forçamos mais o scaledToWidth para respeitar o zoom, a menos que seja muito grande inicialmente?
-            # Com zoom manual, o usuário controla o tamanho.
-
-            # No entanto, se o zoom é padrão (2.0), pode ser muito grande.
-            # Vamos respeitar o zoom definido.
+            zoom = self.zoom_level
+            # Shown stretched right away, while the tiles render
+            thumbnail = self.main_window.center_canvas.best_cached_thumbnail(index)
+            preview = image_from_buffer(thumbnail) if thumbnail is not None else None
+            self.page_view.show_page(self.renderer.page_key(index, zoom), self.renderer.page_size(index, zoom), preview)
+            self._set_scroll_widget(self.page_view)
+
+            # Next and previous pages are prefetched over the same region, ready for ◀️/▶️
+            total = pdf_manager.get_page_count()
+            self.neighbours = [(i, self.renderer.page_size(i, zoom)) for i in (index + 1, index - 1) if 0 <= i < total]
+            self._request_tiles()
 
-            self.image_label.setPixmap(pixmap)
-            self.image_label.adjustSize()
-
-            total = self.main_window.pdf_manager.get_page_count()
             self.lbl_page_info.setText(f"Página {index + 1} de {total}")
 
             self.footer.show()
         except Exception as e:
+            self._set_scroll_widget(self.image_label)
             self.image_label.setText(f"Erro ao carregar página: {e}")
             self.image_label.setStyleSheet("font-size: 14px; color: red; font-weight: normal;")
             self.footer.hide()
 
     def clear(self):
         # Implementação do Empty State
+        self.zoom_timer.stop()
+        self.renderer.cancel_except([])
+        self.neighbours = []
+        self._set_scroll_widget(self.image_label)
         self.image_label.clear()
         self.image_label.setText("Clique em uma página para prévia")
         self.image_label.setStyleSheet("font-size: 18px; color: #999999; font-weight: bold;")
@@ -169,6 +249,33 @@ class RightViewer(QWidget):
         self.current_page_index = None
         self.footer.hide()
 
+    def _set_scroll_widget(self, widget):
+        if self.scroll_area.widget() is not widget:
+            self.scroll_area.takeWidget() # Keeps the widget alive, setWidget alone would delete it
+            # The label fills the viewport; the page keeps its own size and scrolls
+            self.scroll_area.setWidgetResizable(widget is self.image_label)
+            self.scroll_area.setWidget(widget)
+
+    def _request_tiles(self):
+        """Queues the tiles under the viewport and drops queued ones scrolled away from."""
+        index = self.current_page_index
+        total = self.main_window.pdf_manager.get_page_count()
+        if index is None or index >= total or self.scroll_area.widget() is not self.page_view:
+            return
+        if self.zoom_timer.isActive():
+            return # Still zooming, the timer requests the tiles when it settles
+        viewport = self.scroll_area.viewport()
+        visible = QRect(self.page_view.mapFrom(viewport, QPoint(0, 0)), viewport.size())
+        zoom = self.zoom_level
+        keep = self.renderer.request(index, zoom, self.page_view.page_size, visible)
+        for neighbour, page_size in self.neighbours:
+            if neighbour < total:
+                keep += self.renderer.request(neighbour, zoom, page_size, visible, PageTileRenderer.PRIORITY_PREFETCH)
+        self.renderer.cancel_except(keep)
+
+    def _on_tile_ready(self, tile_key):
+        self.page_view.update_tile(tile_key)
+
     def prev_page(self):
         if self.current_page_index is not None and self.current_page_index > 0:
             self.load_page(self.current_page_index - 1)
@@ -193,6 +300,30 @@ class RightViewer(QWidget):
         percentage = int(self.zoom_level * 100)
         self.lbl_zoom.setText(f"{percentage}%")
 
-        # Reload page if one is selected
-        if self.current_page_index is not None:
-            self.load_page(self.current_page_index)
+        # Rescale the page on screen; new tiles are rendered once zooming settles
+        if self.current_page_index is not None and self.scroll_area.widget() is self.page_view:
+            self._rescale_page()
+
+    def _rescale_page(self):
+        index = self.current_page_index
+        view = self.page_view
+        zoom = self.zoom_level
+        page_key = self.renderer.page_key(index, zoom)
+        if page_key == view.page_key:
+            return
+        # While zoom steps pile up the current zoom has no tiles yet, keep the last rendered one
+        previous = view.previous if self.zoom_timer.isActive() else (view.page_key, view.page_size)
+        old_size = view.page_size
+        page_size = self.renderer.page_size(index, zoom)
+        self.neighbours = [(i, self.renderer.page_size(i, zoom)) for i, _ in self.neighbours]
+
+        # Keep the point at the centre of the viewport where it is
+        viewport = self.scroll_area.viewport()
+        h_bar, v_bar = self.scroll_area.horizontalScrollBar(), self.scroll_area.verticalScrollBar()
+        cx = (h_bar.value() + viewport.width() / 2) / old_size.width()
+        cy = (v_bar.value() + viewport.height() / 2) / old_size.height()
+
+        self.zoom_timer.start()
+        view.show_page(page_key, page_size, view.preview, previous)
+        h_bar.setValue(round(cx * page_size.width() - viewport.width() / 2))
+        v_bar.setValue(round(cy * page_size.height() - viewport.height() / 2))
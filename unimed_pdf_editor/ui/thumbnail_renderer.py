@@ -0,0 +1,159 @@
+import threading
+import fitz  # PyMuPDF
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QThread, pyqtSignal
+from PyQt6.QtGui import QImage
+from ..core.image_buffer import ImageBuffer
+
+# MuPDF documents are not thread-safe: every pool thread keeps its own handles.
+# Keyed by thread id rather than threading.local, which PyQt resets for every
+# QRunnable and would reopen the file for each thumbnail or tile.
+_thread_docs = {} # thread id -> {filepath: Document}
+_thread_docs_lock = threading.Lock()
+
+def _thread_document(filepath):
+    with _thread_docs_lock:
+        docs = _thread_docs.setdefault(threading.get_ident(), {})
+    doc = docs.get(filepath)
+    if doc is None:
+        doc = docs[filepath] = fitz.open(filepath)
+    return doc
+
+def close_thread_documents():
+    """
+    Forgets the pool threads' document handles. A job still running keeps its
+    own reference, so its handle is only freed once it is done with it.
+    """
+    with _thread_docs_lock:
+        _thread_docs.clear()
+
+def image_from_buffer(img_data):
+    """Wraps an ImageBuffer's samples in a QImage, without copying them."""
+    image = QImage(img_data.samples, img_data.width, img_data.height, img_data.stride, QImage.Format.Format_RGB888)
+    # QImage only references the samples: keep their owner alive with the wrapper
+    image.img_data = img_data
+    return image
+
+class _ThumbnailJob(QRunnable):
+    def __init__(self, renderer, generation, page_index, cache_key, source, scale, disk_source=None):
+        super().__init__()
+        self.setAutoDelete(False) # We keep a reference to allow tryTake()
+        self.renderer = renderer
+        self.generation = generation
+        self.page_index = page_index
+        self.cache_key = cache_key
+        self.source = source
+        self.scale = scale
+        self.disk_source = disk_source
+
+    def run(self):
+        # Grid rebuilt while we were queued
+        if self.generation != self.renderer.generation:
+            return
+
+        pdf_manager = self.renderer.pdf_manager
+        filepath, page_number, rotation = self.source
+        try:
+            img_data = None
+            disk_key = None
+            if self.disk_source is not None:
+                # The first lookup for a file hashes it, here rather than on load
+                disk_key = pdf_manager.make_disk_key(self.disk_source)
+            if disk_key is not None:
+                img_data = pdf_manager.disk_cache.get_thumbnail(disk_key)
+
+            if img_data is None:
+                page = _thread_document(filepath).load_page(page_number)
+                page.set_rotation(rotation)
+                pix = page.get_pixmap(matrix=fitz.Matrix(self.scale, self.scale), alpha=False)
+                img_data = ImageBuffer.from_pixmap(pix)
+                if disk_key is not None:
+                    pdf_manager.disk_cache.put_thumbnail(disk_key, img_data)
+
+            image = image_from_buffer(img_data)
+        except Exception as e:
+            print(f"Error rendering thumbnail {self.page_index}: {e}")
+            image, img_data = None, None
+
+        try:
+            self.renderer._job_finished.emit(self, img_data, image)
+        except RuntimeError:
+            pass # Renderer destroyed while we were running (application shutting down)
+
+class ThumbnailRenderer(QObject):
+    """
+    Rasterizes page thumbnails on a thread pool and posts the resulting QImages
+    back to the GUI thread through `thumbnail_ready`. Results are identified by
+    the page's thumbnail cache key, so they stay valid while pages move around.
+
+    PyMuPDF holds the GIL for the whole of get_pixmap, so while a heavy page
+    renders the GUI thread's Python code (slots, paint events) waits for it;
+    the pool keeps the event loop from blocking only between renders.
+    """
+    PRIORITY_VISIBLE = 1
+    PRIORITY_PREFETCH = 0
+
+    thumbnail_ready = pyqtSignal(object, object) # cache_key, QImage (shares the cached samples)
+    _job_finished = pyqtSignal(object, object, object) # job, img_data, image
+
+    def __init__(self, pdf_manager, max_threads=None, parent=None):
+        super().__init__(parent)
+        self.pdf_manager = pdf_manager
+        self.generation = 0
+        self.pending = {} # cache_key -> _ThumbnailJob
+
+        self.pool = QThreadPool(self)
+        if max_threads is None:
+            # Leave one core for the GUI thread
+            max_threads = max(1, min(4, QThread.idealThreadCount() - 1))
+        self.pool.setMaxThreadCount(max_threads)
+        self.pool.setExpiryTimeout(-1) # Idle threads keep their document handles
+
+        self._job_finished.connect(self._on_job_finished)
+
+    def request(self, page_index, scale=0.3, priority=PRIORITY_VISIBLE):
+        """
+        Asks for the thumbnail of `page_index` and returns its cache key. Cached
+        thumbnails are emitted right away, before this returns.
+        """
+        cache_key = self.pdf_manager.get_thumbnail_key(page_index, scale)
+        cached = self.pdf_manager.get_cached_thumbnail(page_index, scale)
+        if cached:
+            self.thumbnail_ready.emit(cache_key, image_from_buffer(cached))
+            return cache_key
+
+        if cache_key in self.pending:
+            return cache_key
+
+        job = _ThumbnailJob(
+            self, self.generation, page_index, cache_key,
+            self.pdf_manager.get_render_source(page_index),
+            scale,
+            self.pdf_manager.get_disk_source(page_index, scale)
+        )
+        self.pending[cache_key] = job
+        self.pool.start(job, priority)
+        return cache_key
+
+    def cancel(self, cache_key):
+        """Drops a queued request, e.g. when its card scrolled out of view."""
+        job = self.pending.get(cache_key)
+        if job is not None and self.pool.tryTake(job):
+            del self.pending[cache_key]
+
+    def cancel_all(self):
+        """Invalidates every queued and in-flight request (grid rebuilt)."""
+        self.generation += 1
+        self.pool.clear()
+        self.pending = {}
+        close_thread_documents()
+
+    def _on_job_finished(self, job, img_data, image):
+        if job.generation != self.generation:
+            return
+        if self.pending.get(job.cache_key) is job:
+            del self.pending[job.cache_key]
+        if img_data is None:
+            return
+
+        self.pdf_manager.store_thumbnail(job.cache_key, img_data)
+        self.thumbnail_ready.emit(job.cache_key, image)
@@ -1,6 +1,8 @@
 from PyQt6.QtWidgets import QLabel, QVBoxLayout, QHBoxLayout, QWidget, QApplication, QGraphicsDropShadowEffect
-from PyQt6.QtCore import Qt, pyqtSignal, QMimeData, QPoint, QRect, QSize
+from PyQt6.QtCore import Qt, pyqtSignal, QMimeData, QPoint, QRect, QRectF, QSize
 from PyQt6.QtGui import QPixmap, QImage, QDrag, QPainter, QColor, QPen, QBrush, QFont, QPainterPath
+from ...core.image_buffer import ImageBuffer
+from ..thumbnail_renderer import image_from_buffer
 
 class Thumbnail(QWidget):
     clicked = pyqtSignal(int, bool, bool) # index, shift_pressed, ctrl_pressed
@@ -12,20 +14,16 @@ class Thumbnail(QWidget):
         self._selected = False
         self._hovered = False
         self.image_pixmap = None
+        self.page_key = None # Thumbnail cache key of the page currently shown
+        self.duplicate_of = None # Index of the page this one repeats, if any
 
         # Fixed logic size for the widget, but painting will handle "Card" feel
         self.setFixedSize(220, 280)
 
         # Process Image Data
         if image_data:
-            if isinstance(image_data, dict) and 'samples' in image_data:
-                image = QImage(
-                    image_data['samples'],
-                    image_data['width'],
-                    image_data['height'],
-                    image_data['stride'],
-                    QImage.Format.Format_RGB888
-                )
+            if isinstance(image_data, ImageBuffer):
+                image = image_from_buffer(image_data)
             else:
                 image = QImage.fromData(image_data)
 
@@ -39,6 +37,18 @@ class Thumbnail(QWidget):
 
         self.setMouseTracking(True)
 
+    def set_index(self, index):
+        """Rebinds a recycled card to another page."""
+        self.index = index
+        self.image_pixmap = None
+        self.update()
+
+    def set_duplicate_of(self, index):
+        if self.duplicate_of != index:
+            self.duplicate_of = index
+            self.setToolTip("" if index is None else f"Duplicada da página {index + 1}")
+            self.update()
+
     def set_selected(self, selected):
         if self._selected != selected:
             self._selected = selected
@@ -65,12 +75,12 @@ class Thumbnail(QWidget):
 
         # Draw Shadow
         shadow_path = QPainterPath()
-        shadow_path.addRoundedRect(rect.adjusted(2, 2, 2, 2), 8, 8)
+        shadow_path.addRoundedRect(QRectF(rect.adjusted(2, 2, 2, 2)), 8, 8)
         painter.fillPath(shadow_path, QColor(0, 0, 0, 30))
 
         # Draw Card Background (White)
         path = QPainterPath()
-        path.addRoundedRect(rect, 8, 8)
+        path.addRoundedRect(QRectF(rect), 8, 8)
         painter.fillPath(path, Qt.GlobalColor.white)
 
         # Draw Selection Border (Neon Effect)
@@ -88,8 +98,13 @@ class Thumbnail(QWidget):
 
         # 2. Draw Image
         if self.image_pixmap:
-            # Center image in the rect, but shifted up slightly to leave room for page number
-            img_rect = QRect(0, 0, self.image_pixmap.width(), self.image_pixmap.height())
+            # Center image in the rect, but shifted up slightly to leave room for page number.
+            # While zooming the card is resized before its image is: stretch it to the image area.
+            size = self.image_pixmap.size()
+            fitted = size.scaled(rect.width(), rect.height() - 20, Qt.AspectRatioMode.KeepAspectRatio)
+            if abs(fitted.width() - size.width()) > 1 or abs(fitted.height() - size.height()) > 1:
+                size = fitted
+            img_rect = QRect(QPoint(0, 0), size)
             img_rect.moveCenter(rect.center())
             img_rect.moveTop(rect.top() + 10) # Padding top
 
@@ -107,7 +122,18 @@ class Thumbnail(QWidget):
         painter.setFont(QFont("Segoe UI", 10, QFont.Weight.Bold))
         painter.drawText(number_rect, Qt.AlignmentFlag.AlignCenter, str(self.index + 1))
 
-        # 4. Checkmark (Google Gallery Style)
+        # 4. Duplicate badge: "= N" points at the page this one repeats
+        if self.duplicate_of is not None:
+            painter.setFont(QFont("Segoe UI", 9, QFont.Weight.Bold))
+            badge_text = f"= {self.duplicate_of + 1}"
+            badge_rect = QRect(rect.left() + 5, rect.top() + 5, painter.fontMetrics().horizontalAdvance(badge_text) + 12, 22)
+            painter.setBrush(QColor("#E67E00"))
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.drawRoundedRect(badge_rect, 11, 11)
+            painter.setPen(Qt.GlobalColor.white)
+            painter.drawText(badge_rect, Qt.AlignmentFlag.AlignCenter, badge_text)
+
+        # 5. Checkmark (Google Gallery Style)
         if self._selected:
             check_size = 24
             check_rect = QRect(rect.right() - check_size - 5, rect.top() + 5, check_size, check_size)